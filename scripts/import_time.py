@@ -0,0 +1,189 @@
+"""
+Measures the import time of every Streamlit page with python -X importtime. Run from the repository root:
+
+python scripts/import_time.py                               # print the import time of every page
+python scripts/import_time.py --save                        # save the times as the baseline, data/import_time.json
+python scripts/import_time.py --check                       # fail when a page imports new packages or got slower
+
+Every page is imported in a fresh interpreter, after streamlit like in the running app,
+so only the imports of the page itself are counted.
+
+Absolute times depend on the machine, the check relies on what is stable across machines:
+- the third-party packages imported by every page, a page importing a package missing from its baseline fails
+- the import time of every page divided by the import time of REFERENCE_MODULE in a bare interpreter,
+  only compared when the baseline was made with the same python and streamlit versions
+The baseline records the environment it was made in. Make it in the app image, with the real streamlit:
+
+docker build -t financial-analysis .
+docker run --rm -v "$PWD/data:/app/data" financial-analysis python scripts/import_time.py --save
+"""
+import argparse
+import glob
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+PAGES_PATTERN = "src/pages/[0-9]*.py"
+# committed baseline, regenerate it with --save when a slower import is intended
+BASELINE_PATH = "data/import_time.json"
+MARKER = "-- page imports --"
+# import time of this module in a bare interpreter is the unit of the page times
+REFERENCE_MODULE = "numpy"
+# imports the page the way streamlit runs it, with src on the path and streamlit already imported,
+# then prints the streamlit version and the third-party packages imported by the page
+CHILD = f"""
+import importlib.util, json, sys
+sys.path.insert(0, "src")
+import streamlit
+before = set(sys.modules)
+print("{MARKER}", file=sys.stderr, flush=True)
+spec = importlib.util.spec_from_file_location("page", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+packages = {{name.split(".")[0] for name in set(sys.modules) - before}}
+version = getattr(streamlit, "__version__", None)
+print(json.dumps({{
+    "streamlit": version if isinstance(version, str) else None,
+    "packages": sorted(packages - set(sys.stdlib_module_names) - {{"utils", "page"}} - {{n for n in packages if n.startswith("_")}}),
+}}))
+"""
+
+
+def _top_level_times(lines):
+    # cumulative import time in ms of every module imported at the top level in the -X importtime lines
+    times = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented under the module importing them
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def _run(args, path):
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True)
+    lines = result.stderr.splitlines()
+    if result.returncode != 0:
+        errors = [line for line in lines if not line.startswith("import time:")]
+        raise RuntimeError(f"{path} failed to import:\n" + "\n".join(errors[-5:]))
+    return result.stdout, lines
+
+
+def measure_page(path):
+    """
+    returns
+    times: cumulative import time in ms of every module imported directly by the page
+    info: streamlit version and the third-party packages imported by the page
+    """
+    stdout, lines = _run(["-c", CHILD, path], path)
+    return _top_level_times(lines[lines.index(MARKER) + 1:]), json.loads(stdout.splitlines()[-1])
+
+
+def measure_reference():
+    """
+    Import time in ms of REFERENCE_MODULE in a bare interpreter
+    """
+    _, lines = _run(["-c", f"import {REFERENCE_MODULE}"], REFERENCE_MODULE)
+    return _top_level_times(lines)[REFERENCE_MODULE]
+
+
+def environment(streamlit_version):
+    """
+    Versions and machine the times were measured on
+    """
+    return {
+        "python": platform.python_version(),
+        "streamlit": streamlit_version,
+        REFERENCE_MODULE: importlib.metadata.version(REFERENCE_MODULE),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "docker": os.path.exists("/.dockerenv"),
+    }
+
+
+def benchmark(paths, repeat):
+    reference_ms = statistics.median(measure_reference() for _ in range(repeat))
+    results = {}
+    for path in paths:
+        runs = [measure_page(path) for _ in range(repeat)]
+        totals = [sum(times.values()) for times, _ in runs]
+        # the modules of the median run, the heaviest first
+        median_run, info = runs[totals.index(sorted(totals)[len(totals) // 2])]
+        results[os.path.basename(path)] = {
+            "total_ms": round(statistics.median(totals), 1),
+            "relative": round(statistics.median(totals) / reference_ms, 3),
+            "packages": info["packages"],
+            "top": {name: round(ms, 1) for name, ms in sorted(median_run.items(), key=lambda item: -item[1])[:8]},
+        }
+    return {"environment": environment(info["streamlit"]), "reference_ms": round(reference_ms, 1), "pages": results}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Problems of results against the baseline, a list of messages
+    """
+    problems = []
+    # relative times only mean something with the same interpreter and streamlit, the packages always do
+    keys = ["python", "streamlit"]
+    same_versions = all(results["environment"][key] == baseline["environment"].get(key) for key in keys)
+    if not same_versions:
+        print("baseline made with " + ", ".join(f"{key} {baseline['environment'].get(key)}" for key in keys)
+              + ", running " + ", ".join(f"{key} {results['environment'][key]}" for key in keys)
+              + ": only the imported packages are compared")
+    for page, result in results["pages"].items():
+        if page not in baseline["pages"]:
+            problems.append(f"{page} is not in the baseline, update it with --save")
+            continue
+        expected = baseline["pages"][page]
+        new_packages = sorted(set(result["packages"]) - set(expected["packages"]))
+        if new_packages:
+            problems.append(f"{page} imports new packages: {', '.join(new_packages)}")
+        if same_versions and result["relative"] > expected["relative"] * (1 + tolerance):
+            problems.append(f"{page} regressed: {expected['relative']} -> {result['relative']} "
+                            f"times the import of {REFERENCE_MODULE} ({expected['total_ms']}ms -> {result['total_ms']}ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of the Streamlit pages.")
+    parser.add_argument("--repeat", type=int, default=5, help="imports per page, the median is reported")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, help=f"save the results as a JSON baseline, {BASELINE_PATH} by default")
+    parser.add_argument("--check", nargs="?", const=BASELINE_PATH, help=f"compare with a JSON baseline, {BASELINE_PATH} by default, exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline, relative to the reference import")
+    args = parser.parse_args()
+    # a missing baseline would make every check pass
+    if args.check and not os.path.exists(args.check):
+        parser.error(f"baseline {args.check} does not exist, create it with --save {args.check}")
+    if args.check:
+        with open(args.check, "r") as f:
+            baseline = json.load(f)
+        if "environment" not in baseline:
+            parser.error(f"baseline {args.check} has an old format, update it with --save {args.check}")
+
+    results = benchmark(sorted(glob.glob(PAGES_PATTERN)), args.repeat)
+    print(f"{REFERENCE_MODULE} imports in {results['reference_ms']:.1f}ms, streamlit {results['environment']['streamlit']}")
+    for page, result in results["pages"].items():
+        top = ", ".join(f"{name} {ms:.0f}ms" for name, ms in list(result["top"].items())[:4])
+        print(f"{page:40s} {result['total_ms']:8.1f}ms {result['relative']:6.2f}x  ({top})")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        problems = compare(results, baseline, args.tolerance)
+        for problem in problems:
+            print(problem)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
 from utils.ticker import *
 from utils.trader import *
 from utils.strategy.golden_death_cross import *
+from utils.backtest import *
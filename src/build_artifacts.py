@@ -0,0 +1,57 @@
+"""
+Builds the results of the Streamlit pages into data/artifacts/, so the pages only load them.
+Run from the repository root:
+
+python src/build_artifacts.py                 # every page
+python src/build_artifacts.py the_yield_curve # only the given artifacts
+python src/build_artifacts.py --force         # rebuild even if the inputs did not change
+
+Artifacts are keyed by a hash of the page parameters, input files and source code (the page
+and utils), a page whose inputs and code did not change is skipped.
+"""
+import argparse
+import importlib.util
+import os
+import time
+
+from utils.artifacts import load_artifact, save_artifact
+
+PAGES_PATH = os.path.join(os.path.dirname(__file__), "pages")
+# pages defining ARTIFACT_NAME, get_artifact_key() and build_artifact()
+PAGES = [
+    "1_2024_Q1_Earnings_Analysis.py",
+    "3_The_Yield_Curve.py",
+    "4_Golden_Cross_Death_Cross.py",
+]
+
+
+def load_page(file_name):
+    # page file names start with a digit, they are not importable by name
+    spec = importlib.util.spec_from_file_location(os.path.splitext(file_name)[0], os.path.join(PAGES_PATH, file_name))
+    page = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(page)
+    return page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed results of the Streamlit pages.")
+    parser.add_argument("names", nargs="*", help="artifact names to build, all pages by default")
+    parser.add_argument("--force", action="store_true", help="rebuild artifacts that already exist")
+    args = parser.parse_args()
+
+    for file_name in PAGES:
+        page = load_page(file_name)
+        if args.names and page.ARTIFACT_NAME not in args.names:
+            continue
+        key = page.get_artifact_key()
+        if not args.force and load_artifact(page.ARTIFACT_NAME, key) is not None:
+            print(f"{page.ARTIFACT_NAME} {key} is up to date")
+            continue
+
+        start = time.perf_counter()
+        path = save_artifact(page.ARTIFACT_NAME, key, **page.build_artifact())
+        print(f"{page.ARTIFACT_NAME} {key} built in {time.perf_counter() - start:.1f}s -> {path}")
+
+
+if __name__ == "__main__":
+    main()
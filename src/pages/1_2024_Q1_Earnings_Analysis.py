@@ -1,12 +1,13 @@
 import pandas as pd
 import numpy as np
-import yfinance as yahooFinance
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from plotly.colors import n_colors
-from scipy import stats
 import streamlit as st
 
+from utils.artifacts import artifact_key, get_page_artifact
+from utils.event_study import EventStudyContext, get_AR_CMR, get_AR_CAPM, get_AR_FF
+from utils.factor_store import FF_FACTORS_PATH
+from utils.prices import price_source_key
+
 START_DATE = '2023-08-01'
 END_DATE = '2024-08-01'
 TICKERS2CALLDATE = {
@@ -19,108 +20,55 @@ TICKERS2CALLDATE = {
     "V": "2024-04-24"
 }
 EVENT_WINDOW = [2, 3]
+ARTIFACT_NAME = "2024_q1_earnings_analysis"
 
-def get_ticker_df(ticker):
-    res_df = yahooFinance.Ticker(ticker).history(start=START_DATE, end=END_DATE)
-    return res_df
-
-def get_returns(prices):
-    returns = []
-    for i in range(1, len(prices)):
-        returns.append(prices[i] / prices[i-1] - 1)
-    returns.append(0)
-    return np.array(returns)
-
-def get_AR_CMR(returns):
+@st.cache_resource
+def get_event_study_context():
     """
-    returns
-    model_returns: array of returns by the model
-    ar_returns: array of abnormal returns
-    ar_std: standard deviation of the abnormal returns
-    mva_ar_returns: array of moving average of abnormal returns
+    Returns the event study context shared across reruns, holding the prices of all tickers, the ^GSPC returns and the Fama-French factors
     """
-    model_returns = np.mean(returns) * np.ones(len(returns))
-    ar_returns = returns - model_returns
-    ar_std = np.std(ar_returns)
-    mva_ar_returns = np.convolve(ar_returns, np.ones(EVENT_WINDOW[0] + EVENT_WINDOW[1]) / (EVENT_WINDOW[0] + EVENT_WINDOW[1]), mode='valid')
-    return model_returns, ar_std, ar_returns, mva_ar_returns
+    return EventStudyContext(START_DATE, END_DATE, tickers=list(TICKERS2CALLDATE.keys()), event_window=EVENT_WINDOW)
 
-def get_AR_CAPM(returns, market_returns):
-    """
-    returns
-    model_returns: array of returns by the model
-    ar_returns: array of abnormal returns
-    mva_ar_returns: array of moving average of abnormal returns
-    """
-    beta = np.cov(returns, market_returns)[0][1] / np.var(market_returns)
-    model_returns = beta * market_returns + np.mean(returns - beta * market_returns)
-    ar_returns = returns - model_returns
-    ar_std = np.std(ar_returns)
-    mva_ar_returns = np.convolve(ar_returns, np.ones(EVENT_WINDOW[0] + EVENT_WINDOW[1]) / (EVENT_WINDOW[0] + EVENT_WINDOW[1]), mode='valid')
-    return model_returns, ar_returns, ar_std, mva_ar_returns
-
-def _get_FF_coeff_df():
-    ff_coeff_df = pd.read_csv("data/F-F_Research_Data_Factors_daily.csv")
-    ff_coeff_df["date"] = pd.to_datetime(ff_coeff_df["date"], format='%Y%m%d')
-    ff_coeff_df = ff_coeff_df[(ff_coeff_df["date"] >= START_DATE) & (ff_coeff_df["date"] <= END_DATE)]
-    ff_coeff_df = ff_coeff_df.set_index("date")
-    return ff_coeff_df
-
-def get_AR_FF(returns, market_returns):
-    """
-    returns
-    model_returns: array of returns by the model
-    model_std: standard deviation of the model returns
-    ar_returns: array of abnormal returns
-    mva_ar_returns: array of moving average of abnormal returns
-    """
-    ff_coeff_df = _get_FF_coeff_df()
-    b1 = np.cov(returns - ff_coeff_df["RF"], market_returns - ff_coeff_df["RF"])[0][1] / np.var(market_returns - ff_coeff_df["RF"])
-    b2 = np.cov(returns, ff_coeff_df["SMB"])[0][1] / np.var(ff_coeff_df["SMB"])
-    b3 = np.cov(returns, ff_coeff_df["HML"])[0][1] / np.var(ff_coeff_df["HML"])
-    alpha = np.mean(returns - ff_coeff_df["RF"] - b1 * (market_returns - ff_coeff_df["RF"]) - b2 * ff_coeff_df["SMB"] - b3 * ff_coeff_df["HML"])
-    model_returns = alpha + ff_coeff_df["RF"] + b1 * (market_returns - ff_coeff_df["RF"]) + b2 * ff_coeff_df["SMB"] + b3 * ff_coeff_df["HML"]
-    ar_returns = returns - model_returns
-    ar_std = np.std(ar_returns)
-    mva_ar_returns = np.convolve(ar_returns, np.ones(EVENT_WINDOW[0] + EVENT_WINDOW[1]) / (EVENT_WINDOW[0] + EVENT_WINDOW[1]), mode='valid')
-    return model_returns, ar_returns, ar_std, mva_ar_returns
-
-def plot_model_returns(ticker, prices, returns, model_returns):
+def plot_model_returns(ticker, closes, returns, model_returns):
+    from plotly.subplots import make_subplots
     fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.02)
-    fig.add_trace(go.Scatter(x=prices.index, y=prices["Close"], name="Close Price"), row=1, col=1)
-    fig.add_trace(go.Scatter(x=prices.index, y=returns, name="Returns"), row=2, col=1)
-    fig.add_trace(go.Scatter(x=prices.index, y=model_returns, name="Model Returns"), row=2, col=1)
+    fig.add_trace(go.Scatter(x=closes.index, y=closes.values, name="Close Price"), row=1, col=1)
+    fig.add_trace(go.Scatter(x=closes.index, y=returns, name="Returns"), row=2, col=1)
+    fig.add_trace(go.Scatter(x=closes.index, y=model_returns, name="Model Returns"), row=2, col=1)
     fig.update_layout(title=f"{ticker} Model Returns", xaxis_title="Date", yaxis_title="Price", showlegend=True)
     fig.show()
 
+def get_ticker_returns(context, ticker):
+    """
+    Returns the closes and returns of a ticker on the study dates, aligned with the market returns and factors
+    """
+    returns = context.get_returns_matrix([ticker])[:, 0]
+    return context.closes[ticker].reindex(context.dates), returns
+
 def plot_MR_CMR(ticker):
-    prices = get_ticker_df(ticker)
-    returns = get_returns(prices["Close"].values)
-    model_returns, ar_std, ar_returns, mva_ar_returns = get_AR_CMR(returns)
-    plot_model_returns(ticker, prices, returns, model_returns)
+    context = get_event_study_context()
+    closes, returns = get_ticker_returns(context, ticker)
+    model_returns, ar_std, ar_returns, mva_ar_returns = get_AR_CMR(returns, EVENT_WINDOW)
+    plot_model_returns(ticker, closes, returns, model_returns)
 
 def plot_MR_CAPM(ticker):
-    prices = get_ticker_df(ticker)
-    returns = get_returns(prices["Close"].values)
-    market_prices = get_ticker_df("^GSPC")
-    market_returns = get_returns(market_prices["Close"].values)
-    model_returns, ar_returns, ar_std, mva_ar_returns = get_AR_CAPM(returns, market_returns)
-    plot_model_returns(ticker, prices, returns, model_returns)
+    context = get_event_study_context()
+    closes, returns = get_ticker_returns(context, ticker)
+    model_returns, ar_returns, ar_std, mva_ar_returns = get_AR_CAPM(returns, context.market_returns, EVENT_WINDOW)
+    plot_model_returns(ticker, closes, returns, model_returns)
 
 def plot_MR_FF(ticker):
-    prices = get_ticker_df(ticker)
-    returns = get_returns(prices["Close"].values)
-    market_prices = get_ticker_df("^GSPC")
-    market_returns = get_returns(market_prices["Close"].values)
-    model_returns, ar_returns, ar_std, mva_ar_returns = get_AR_FF(returns, market_returns)
-    plot_model_returns(ticker, prices, returns, model_returns)
-
-def display_model_comparison():
+    context = get_event_study_context()
+    closes, returns = get_ticker_returns(context, ticker)
+    model_returns, ar_returns, ar_std, mva_ar_returns = get_AR_FF(returns, context.market_returns, context.ff_coeff_df, EVENT_WINDOW)
+    plot_model_returns(ticker, closes, returns, model_returns)
+
+def plot_model_comparison():
     """
-    Displays the model comparison table from data/model_comparison.csv
+    Returns the model comparison table, fitted from the event study context
     """
-    results_df = pd.read_csv("data/model_comparison.csv")
-    results_df = results_df.rename(columns={"Unnamed: 0": "Ticker", "Unnamed: 1": "Model"})
+    results_df = get_event_study_context().model_comparison(list(TICKERS2CALLDATE.keys()))
+    results_df = results_df.rename_axis(["Ticker", "Model"]).reset_index()
     results_df = results_df[["Ticker", "Model", "R2"]]
     results_df["R2"] = results_df["R2"].apply(lambda x: f"{x:.2f}")
     tickers = results_df["Ticker"].unique()
@@ -163,26 +111,25 @@ def display_model_comparison():
         height=570,
         margin=dict(b=0),
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def plot_AR(ticker):
+def plot_AR(ticker, context, fit):
     """
     Returns the plot of the abnormal returns of the ticker, and the z-score and p-value of the earning date.
+    fit is the (model_returns, ar_returns, ar_std, mva_ar_returns) of the ticker from EventStudyContext.fit_FF
     """
-    prices = get_ticker_df(ticker)
-    returns = get_returns(prices["Close"].values)
-    market_prices = get_ticker_df("^GSPC")
-    market_returns = get_returns(market_prices["Close"].values)
-    model_returns, ar_returns, ar_std, mva_ar_returns = get_AR_FF(returns, market_returns)
-    earning_date = prices.index[prices.index.date == pd.to_datetime(TICKERS2CALLDATE[ticker]).date()][0]
-    earning_index = prices.index.get_loc(earning_date)
+    from scipy import stats
+    model_returns, ar_returns, ar_std, mva_ar_returns = fit
+    dates = context.dates
+    earning_date = dates[dates.date == pd.to_datetime(TICKERS2CALLDATE[ticker]).date()][0]
+    earning_index = dates.get_loc(earning_date)
     z_score = mva_ar_returns[earning_index] / ar_std / np.sqrt(EVENT_WINDOW[0] + EVENT_WINDOW[1])
     p_value = (1 - stats.norm.cdf(z_score)) / 2
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=prices.index, y=ar_returns, name="AR"))
+    fig.add_trace(go.Scatter(x=dates, y=ar_returns, name="AR"))
     fig.add_vline(x=earning_date, line_dash="dash", line_color="blue", line_width=2, name="Earning Call")
-    fig.add_trace(go.Scatter(x=prices.index[EVENT_WINDOW[0]:-EVENT_WINDOW[1]], y=mva_ar_returns, name="MVA AR"))
+    fig.add_trace(go.Scatter(x=dates[EVENT_WINDOW[0]:-EVENT_WINDOW[1]], y=mva_ar_returns, name="MVA AR"))
     fig.add_hrect(y0=-ar_std, y1=ar_std, fillcolor="#F0E68C", opacity=0.2, layer="below", line_width=0)
     fig.update_layout(
         title=f"{ticker} Abnormal Returns",
@@ -197,15 +144,19 @@ def plot_AR(ticker):
 def get_all_AR():
     """
     Returns the plot data, z-scores, and p-values of all the tickers.
+    The FF model is fitted for every ticker in one batched job, sharing the benchmark and factor data.
     """
+    context = get_event_study_context()
+    fits = context.fit_FF(list(TICKERS2CALLDATE.keys()))
     plot_data = {}
     z_scores = {}
     p_values = {}
     for ticker in TICKERS2CALLDATE.keys():
-        plot_data[ticker], z_scores[ticker], p_values[ticker] = plot_AR(ticker)
+        plot_data[ticker], z_scores[ticker], p_values[ticker] = plot_AR(ticker, context, fits[ticker])
     return plot_data, z_scores, p_values
 
-def display_z_score_p_value(z_scores, p_values):
+def plot_z_score_p_value(z_scores, p_values):
+    from plotly.colors import n_colors
     df = pd.DataFrame({"Ticker": list(z_scores.keys()), "Z-Score": list(z_scores.values()), "P-Value": list(p_values.values())})
     red_colors = n_colors("rgb(50, 20, 20)", "rgb(200, 50, 50)", 100, colortype="rgb")
     green_colors = n_colors("rgb(1, 50, 32)", "rgb(20, 200, 50)", 100, colortype="rgb")[::-1]
@@ -238,7 +189,29 @@ def display_z_score_p_value(z_scores, p_values):
         height=290,
         margin=dict(b=0),
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def get_artifact_key():
+    return artifact_key(ARTIFACT_NAME, dict(
+        start_date=START_DATE, end_date=END_DATE, tickers2calldate=TICKERS2CALLDATE, event_window=EVENT_WINDOW,
+        prices=price_source_key(START_DATE, END_DATE),
+    ), input_paths=[FF_FACTORS_PATH], source_paths=[__file__])
+
+def build_artifact():
+    """
+    Fits the models and returns the figures, z-scores and p-values of the page, see utils.artifacts.save_artifact
+    """
+    plot_data, z_scores, p_values = get_all_AR()
+    figures = {
+        "model_comparison": plot_model_comparison(),
+        "z_score_p_value": plot_z_score_p_value(z_scores, p_values),
+        **{f"AR_{ticker}": fig for ticker, fig in plot_data.items()},
+    }
+    data = {
+        "z_scores": {ticker: float(z_score) for ticker, z_score in z_scores.items()},
+        "p_values": {ticker: float(p_value) for ticker, p_value in p_values.items()},
+    }
+    return dict(figures=figures, data=data)
 
 def main():
     st.set_page_config(
@@ -310,7 +283,8 @@ def main():
     ### Model Comparison
     We will compare the R-squared values of the three models to see which model fits the data the best.
     """)
-    display_model_comparison()
+    artifact = get_page_artifact(ARTIFACT_NAME, get_artifact_key, build_artifact)
+    st.plotly_chart(artifact.figure("model_comparison"), use_container_width=True)
     st.markdown("""
     After comparing the model performance from 2023-08-01 to 2024-08-01, we find that the FF model has the highest R-squared values for all the companies.
     Slightly beating the CAPM model, and significantly beating the CMR model.
@@ -343,21 +317,20 @@ def main():
     Z = \\frac{AR_{\\text{mva, t}}}{\\sigma_{AR} \\sqrt{n}}
     $$
     """)
-    plot_data, z_scores, p_values = get_all_AR()
-    display_z_score_p_value(z_scores, p_values)
+    st.plotly_chart(artifact.figure("z_score_p_value"), use_container_width=True)
     st.markdown("""
     From the z-score and p-value, we can see that NVIDIA and Tesla had the most impact on their stock prices during their earning calls.
     Trying the plot the abnormal returns of NVIDIA and Tesla, we can see that the abnormal returns are significantly higher than the normal fluctuations.
     """)
 
-    st.plotly_chart(plot_data["NVDA"], use_container_width=True)
-    st.plotly_chart(plot_data["TSLA"], use_container_width=True)
+    st.plotly_chart(artifact.figure("AR_NVDA"), use_container_width=True)
+    st.plotly_chart(artifact.figure("AR_TSLA"), use_container_width=True)
 
     st.markdown("""
     On the other hand, Apple, Microsoft, and Visa had a relatively small impact on their stock prices during their earning calls.
     """)
 
-    st.plotly_chart(plot_data["AAPL"], use_container_width=True)
+    st.plotly_chart(artifact.figure("AR_AAPL"), use_container_width=True)
 
     st.markdown("""
     ## Discussion
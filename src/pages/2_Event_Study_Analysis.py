@@ -1,10 +1,10 @@
+import math
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.stats as stats
-from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import streamlit as st
 
+from utils.returns import simple_returns
+
 def generate_jumping_stock(n_days, event_day):
     """
     Returns a time series of stock prices with a jump in price on the event day
@@ -20,17 +20,6 @@ def generate_jumping_stock(n_days, event_day):
     return days, stock_price
 
 
-def generate_returns(time_series):
-    """
-    Returns the returns of a time series
-    """
-    return_series = []
-    for i in range(len(time_series) - 1):
-        return_series.append(1 - time_series[i] / time_series[i + 1])
-    return_series.append(0)
-    return np.array(return_series)
-
-
 def CMR_model(returns):
     """
     Returns the mean and Variance of the returns
@@ -39,6 +28,7 @@ def CMR_model(returns):
 
 
 def plot_stock_price_and_returns(days, stock_price, returns):
+    from plotly.subplots import make_subplots
     fig = make_subplots(rows=1, cols=2, subplot_titles=("Stock Price", "Returns"))
     fig.add_trace(go.Scatter(x=days, y=stock_price, mode='lines', name='Stock Price'), row=1, col=1)
     fig.add_vrect(x0=DEMO_EVENT_DAY - DEMO_EVENT_WINDOW_PRE, x1=DEMO_EVENT_DAY + DEMO_EVENT_WINDOW_POST, fillcolor="LightSalmon", opacity=0.5, line_width=0, row=1, col=1)
@@ -86,7 +76,8 @@ def plot_abnormal_returns(days, abnormal_returns):
     st.plotly_chart(fig, use_container_width=True)
 
     z_score = (AR_mva[DEMO_EVENT_DAY-DEMO_EVENT_WINDOW_PRE] - AR_avg) / AR_std
-    p_value = 1 - stats.norm.cdf(z_score)
+    # 1 - normal cdf, without importing scipy.stats for a single value
+    p_value = 0.5 * math.erfc(z_score / math.sqrt(2))
     st.markdown("""
     $$
     \\text{Z-score = } %.2f, \\text{ p-value = } %.4f
@@ -121,7 +112,7 @@ def main():
     DEMO_EVENT_DAY = st.slider("Event day", 10, DEMO_NUMBER_OF_DAYS - 20 , 30, 1)
 
     days, stock_price = generate_jumping_stock(DEMO_NUMBER_OF_DAYS, DEMO_EVENT_DAY)
-    returns = generate_returns(stock_price)
+    returns = simple_returns(stock_price)
     mean, variance = CMR_model(returns)
     abnormal_returns = returns - mean
 
@@ -1,25 +1,17 @@
 import pandas as pd
 import numpy as np
-from scipy.interpolate import griddata
 import plotly.graph_objects as go
-import yfinance as yahooFinance
 import streamlit as st
-from plotly.subplots import make_subplots
-
-DATA_PATH = 'data/'
-TREASURY_YIELD_CURVE = 'treasury_yield_curve.csv'
-MATURITY_TO_DT = {
-    "3 Mo": pd.DateOffset(months=3),
-    "6 Mo": pd.DateOffset(months=6),
-    "1 Yr": pd.DateOffset(years=1),
-    "2 Yr": pd.DateOffset(years=2),
-    "3 Yr": pd.DateOffset(years=3),
-    "5 Yr": pd.DateOffset(years=5),
-    "7 Yr": pd.DateOffset(years=7),
-    "10 Yr": pd.DateOffset(years=10),
-    "20 Yr": pd.DateOffset(years=20),
-    "30 Yr": pd.DateOffset(years=30)
-}
+
+from utils.artifacts import artifact_key, get_page_artifact
+from utils.prices import get_price_cache, price_source_key
+from utils.yield_curve import MATURITY_TO_MONTHS, tenor_spreads, yield_surface
+from utils.yield_store import YIELD_CURVE_PATH, get_yield_store
+
+# grid points per axis of the 3D surface and its interpolation method, see utils.yield_curve.yield_surface
+SURFACE_RESOLUTION = 100
+SURFACE_INTERPOLATION = "grid"
+MATURITY_TO_DT = {key: pd.DateOffset(months=months) for key, months in MATURITY_TO_MONTHS.items()}
 NORMAL_YIELD_DATE = "2022-03-02"
 INVERTED_YIELD_DATE = "2007-03-15"
 
@@ -28,41 +20,19 @@ LONG_TERM_MATURITY = "10 Yr"
 
 FINANCIAL_CRISIS_EARLY_2000 = ["2000-03-01", "2003-06-01"]
 FINANCIAL_CRISIS_2007_2008 = ["2006-03-01", "2009-12-01"]
+ARTIFACT_NAME = "the_yield_curve"
 
-def plot_3d_yield_curve(df):
-    # fill as 3d array
-    current_dates = []
-    yields = []
-    maturity_dates = []
-
-    for date in df.index:
-        for key, value in MATURITY_TO_DT.items():
-            current_dates.append(date)
-            yields.append(df[key][date])
-            maturity_dates.append(date + value)
-
-    # interpolate
-    current_dates_num = pd.to_datetime(current_dates).map(pd.Timestamp.toordinal)
-    maturity_dates_num = pd.to_datetime(maturity_dates).map(pd.Timestamp.toordinal)
-
-    grid_x, grid_y = np.mgrid[
-        current_dates_num.min():current_dates_num.max():100j,
-        maturity_dates_num.min():maturity_dates_num.max():100j
-        ]
-
-    grid_z = griddata(
-        (current_dates_num, maturity_dates_num),
-        yields,
-        (grid_x, grid_y),
-        method='linear'
-        )
+def plot_3d_yield_curve(df, resolution=SURFACE_RESOLUTION, method=SURFACE_INTERPOLATION):
+    maturities = list(MATURITY_TO_MONTHS)
+    grid_x, grid_y, grid_z = yield_surface(df.index.values, df[maturities].values, list(MATURITY_TO_MONTHS.values()),
+                                           resolution, method)
 
     # Create the surface plot
     fig = go.Figure(data=[go.Surface(x=grid_x, y=grid_y, z=grid_z)])
 
     # Define tick positions and labels
-    tickvals_x = np.linspace(current_dates_num.min(), current_dates_num.max(), 10)
-    tickvals_y = np.linspace(maturity_dates_num.min(), maturity_dates_num.max(), 10)
+    tickvals_x = np.linspace(grid_x.min(), grid_x.max(), 10)
+    tickvals_y = np.linspace(grid_y.min(), grid_y.max(), 10)
     ticktext_x = [pd.Timestamp.fromordinal(int(val)).strftime('%Y-%m') for val in tickvals_x]
     ticktext_y = [pd.Timestamp.fromordinal(int(val)).strftime('%Y-%m') for val in tickvals_y]
 
@@ -86,9 +56,7 @@ def plot_3d_yield_curve(df):
         ),
         height=700
     )
-    st.plotly_chart(fig, use_container_width=True)
-
-    return
+    return fig
 
 def plot_normal_yield_curve(df):
     fig = go.Figure()
@@ -112,9 +80,7 @@ def plot_normal_yield_curve(df):
         xaxis_fixedrange=True,
         yaxis_fixedrange=True
     )
-    st.plotly_chart(fig, use_container_width=True)
-
-    return
+    return fig
 
 def plot_inverted_yield_curve(df):
     fig = go.Figure()
@@ -138,9 +104,7 @@ def plot_inverted_yield_curve(df):
         xaxis_fixedrange=True,
         yaxis_fixedrange=True
     )
-    st.plotly_chart(fig, use_container_width=True)
-
-    return
+    return fig
 
 def plot_yield_curve_by_maturity(df):
     fig = go.Figure()
@@ -162,16 +126,15 @@ def plot_yield_curve_by_maturity(df):
 
 
 
-    st.plotly_chart(fig, use_container_width=True)
-
-    return
+    return fig
 
 def plot_yield_and_spy(df):
-    spy = yahooFinance.Ticker('SPY').history(start=df.index.min(), end=df.index.max())[::5]["Close"]
+    from plotly.subplots import make_subplots
+    spy = get_price_cache().history('SPY', df.index.min(), df.index.max())[::5]["Close"]
     interest_rate = (spy / spy.shift(1) - 1)
     moving_avg = interest_rate.rolling(window=30).mean()
 
-    spread = df[LONG_TERM_MATURITY] - df[SHORT_TERM_MATURITY]
+    spread = tenor_spreads(df)[f"{LONG_TERM_MATURITY} - {SHORT_TERM_MATURITY}"]
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.add_trace(go.Scatter(x=df.index, y=spread, mode='lines', name='Spread'), secondary_y=False)
     fig.add_trace(go.Scatter(x=interest_rate.index, y=moving_avg, mode='lines', name='SPY 30d'), secondary_y=True)
@@ -196,16 +159,36 @@ def plot_yield_and_spy(df):
         fillcolor="red", opacity=0.25, layer="below", line_width=0
     )
 
-    st.plotly_chart(fig, use_container_width=True)
-
-    return
-
-def read_df():
-    df = pd.read_csv(DATA_PATH + TREASURY_YIELD_CURVE)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.set_index('Date')
-
-    return df
+    return fig
+
+def read_df(start_date=None, end_date=None, every=1):
+    """
+    Yield curve between start_date and end_date at full resolution, or every `every`-th day
+    """
+    return get_yield_store().to_frame(start_date, end_date, every)
+
+def get_artifact_key():
+    return artifact_key(ARTIFACT_NAME, dict(
+        normal_yield_date=NORMAL_YIELD_DATE, inverted_yield_date=INVERTED_YIELD_DATE,
+        short_term_maturity=SHORT_TERM_MATURITY, long_term_maturity=LONG_TERM_MATURITY,
+        surface_resolution=SURFACE_RESOLUTION, surface_interpolation=SURFACE_INTERPOLATION,
+        # the SPY range follows the dates of the yield curve file
+        prices=price_source_key(),
+    ), input_paths=[YIELD_CURVE_PATH], source_paths=[__file__])
+
+def build_artifact():
+    """
+    Returns the figures of the page, see utils.artifacts.save_artifact
+    """
+    df = read_df()
+    figures = {
+        "normal_yield_curve": plot_normal_yield_curve(df),
+        "inverted_yield_curve": plot_inverted_yield_curve(df),
+        "yield_curve_by_maturity": plot_yield_curve_by_maturity(df),
+        "yield_and_spy": plot_yield_and_spy(df),
+        "3d_yield_curve": plot_3d_yield_curve(df),
+    }
+    return dict(figures=figures)
 
 def main():
     st.set_page_config(
@@ -213,21 +196,21 @@ def main():
         page_icon="📈",
     )
 
-    df = read_df()
-
     st.title("The Yield Curve")
 
     st.markdown("*8 min read*")
 
+    artifact = get_page_artifact(ARTIFACT_NAME, get_artifact_key, build_artifact)
+
     overview = open("src/pages/texts/the_yield_curve/overview.md", "r").read()
     st.markdown(overview)
 
     types_of_yield_curve = open("src/pages/texts/the_yield_curve/types_of_yield_curve.md", "r").read()
     st.markdown(types_of_yield_curve)
 
-    plot_normal_yield_curve(df)
+    st.plotly_chart(artifact.figure("normal_yield_curve"), use_container_width=True)
 
-    plot_inverted_yield_curve(df)
+    st.plotly_chart(artifact.figure("inverted_yield_curve"), use_container_width=True)
 
     yield_curve_explanation = open("src/pages/texts/the_yield_curve/yield_curve_explanation.md", "r").read()
     st.markdown(yield_curve_explanation)
@@ -235,17 +218,17 @@ def main():
     spread = open("src/pages/texts/the_yield_curve/spread.md", "r").read()
     st.markdown(spread)
 
-    plot_yield_curve_by_maturity(df)
+    st.plotly_chart(artifact.figure("yield_curve_by_maturity"), use_container_width=True)
 
     yield_and_spy = open("src/pages/texts/the_yield_curve/yield_and_spy.md", "r").read()
     st.markdown(yield_and_spy)
 
-    plot_yield_and_spy(df)
+    st.plotly_chart(artifact.figure("yield_and_spy"), use_container_width=True)
 
     yield_3d = open("src/pages/texts/the_yield_curve/yield_3d.md", "r").read()
     st.markdown(yield_3d)
 
-    plot_3d_yield_curve(df)
+    st.plotly_chart(artifact.figure("3d_yield_curve"), use_container_width=True)
 
     return
 
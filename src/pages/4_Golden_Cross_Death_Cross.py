@@ -1,13 +1,14 @@
-from collections import defaultdict
-import yfinance as yahooFinance
 import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
 import logging
 
-from utils.ticker import StockTicker
-from utils.trader import Trader
-from utils.strategy.golden_death_cross import GoldenAndDeathCrossStrategy
+from utils.artifacts import artifact_key, get_page_artifact
+from utils.downsample import lttb_indices
+from utils.prices import get_price_cache, price_source_key
+from utils.backtest import BUY, SELL, backtest_buy_and_hold, backtest_fixed_buys, backtest_signals
+from utils.strategy.golden_death_cross import GoldenDeathCross
+from utils.strategy.indicators import IndicatorCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -22,91 +23,72 @@ END_DATE = "2017-01-01"
 SHORT_MVA = 30
 LONG_MVA = 200
 COMMISSION_RATE = 0.05
-
-# Function to fetch ticker data
-@st.cache_data
-def fetch_ticker_data(ticker_symbol, start_date, end_date):
-    try:
-        df = yahooFinance.Ticker(ticker_symbol).history(start=start_date, end=end_date)
-        return df
-    except Exception as e:
-        logging.error(f"Error fetching data for {ticker_symbol}: {e}")
-        st.error("Failed to fetch stock data. Please try again later.")
-        return None
+THRESHOLD = 0.01
+# points kept per line of the figures, whatever the length of the history
+FIGURE_POINTS = 1000
+ARTIFACT_NAME = "golden_cross_death_cross"
 
 # Function to run trading strategies
 def run_trading_simulation(ticker_df):
-    spy_ticker = StockTicker(ticker_df)
-    golden_death_cross = GoldenAndDeathCrossStrategy(spy_ticker, SHORT_MVA, LONG_MVA, 0.01)
-
-    # Traders setup
-    trader_benchmark = Trader(START_CASH, spy_ticker, commission=0)
-    trader_benchmark.buy(START_CASH)
-
-    trader_commission = Trader(START_CASH, spy_ticker, commission=COMMISSION_RATE)
-    trader_no_commission = Trader(START_CASH, spy_ticker, commission=0)
-    trader_death_cross = Trader(START_CASH, spy_ticker, commission=COMMISSION_RATE)
-
-    portfolio_values = defaultdict(list)
-
-    for i in range(TRADING_DAYS):
-        # Daily buy for commission and no-commission traders
-        trader_commission.buy(AMOUNT_BOUGHT_PER_DAY)
-        trader_no_commission.buy(AMOUNT_BOUGHT_PER_DAY)
-
-        # Execute strategy based on signals
-        signal = golden_death_cross.get_signal()
-        if signal == "buy":
-            trader_death_cross.buy(trader_death_cross.cash / 2)
-        elif signal == "sell":
-            trader_death_cross.sell(trader_death_cross.holdings / 2)
-
-        # Store portfolio values
-        portfolio_values['benchmark'].append(trader_benchmark.portfolio_value())
-        portfolio_values['commission'].append(trader_commission.portfolio_value())
-        portfolio_values['no_commission'].append(trader_no_commission.portfolio_value())
-        portfolio_values['death_cross'].append(trader_death_cross.portfolio_value())
-
-        spy_ticker.next_day()
-
-    return portfolio_values, spy_ticker, golden_death_cross
+    history = ticker_df.Close.iloc[:TRADING_DAYS]
+    prices = history.values
+
+    # Signals of the whole history at once, the moving averages are kept in the cache for the plots
+    golden_death_cross = GoldenDeathCross(SHORT_MVA, LONG_MVA, THRESHOLD)
+    cache = IndicatorCache(prices)
+    signal = golden_death_cross.run(cache=cache)
+    averages = golden_death_cross.averages(cache)
+
+    # Traders are simulated over the whole price array at once
+    portfolio_values = {}
+    portfolio_values['benchmark'] = backtest_buy_and_hold(prices, START_CASH)[2]
+    portfolio_values['commission'] = backtest_fixed_buys(prices, AMOUNT_BOUGHT_PER_DAY, START_CASH, commission=COMMISSION_RATE)[2]
+    portfolio_values['no_commission'] = backtest_fixed_buys(prices, AMOUNT_BOUGHT_PER_DAY, START_CASH)[2]
+    portfolio_values['death_cross'] = backtest_signals(prices, signal, START_CASH, commission=COMMISSION_RATE)[2]
+
+    return portfolio_values, history, signal, averages
+
+# Line trace of y against x, downsampled with LTTB to FIGURE_POINTS points
+def line_trace(x, y, name):
+    y = np.asarray(y, dtype=np.float64)
+    keep = lttb_indices(y, FIGURE_POINTS)
+    return go.Scatter(x=x[keep], y=y[keep], mode='lines', name=name)
+
+# Full-height vertical dashed lines at x[indices], as a single trace of NaN-separated segments
+# drawn on the hidden yaxis2 spanning [0, 1], instead of one layout shape per signal
+def signal_segments(x, indices, color, name):
+    segment_x = np.repeat(np.asarray(x[indices]), 3)
+    segment_y = np.tile([0.0, 1.0, np.nan], len(indices))
+    return go.Scatter(x=segment_x, y=segment_y, mode='lines', name=name, yaxis='y2', showlegend=False,
+                      hoverinfo='skip', line=dict(color=color, width=2, dash='dash'))
+
+# Adds the buy and sell signal lines of the strategy to the figure
+def add_signal_segments(fig, dates, signal):
+    buy_indices, sell_indices = np.flatnonzero(signal == BUY), np.flatnonzero(signal == SELL)
+    fig.add_trace(signal_segments(dates, buy_indices, 'green', 'Buy'))
+    fig.add_trace(signal_segments(dates, sell_indices, 'red', 'Sell'))
+    fig.update_layout(yaxis2=dict(overlaying='y', range=[0, 1], visible=False, fixedrange=True))
+    return buy_indices, sell_indices
 
 # Plotting function
-def plot_mva_results(spy_ticker, golden_death_cross, portfolio_values):
+def plot_mva_results(prices, signal, averages):
     fig = go.Figure()
+    dates = prices.index
+    short_avg, long_avg = averages
 
-    # Add SPY price trace
-    fig.add_trace(go.Scatter(x=spy_ticker.get_price_history(TRADING_DAYS).index,
-                             y=spy_ticker.get_price_history(TRADING_DAYS).values,
-                             mode='lines', name='SPY'))
-
-    # Add MVA traces
-    fig.add_trace(go.Scatter(x=spy_ticker.get_price_history(TRADING_DAYS).index,
-                             y=golden_death_cross.slow_avg,
-                             mode='lines', name=f'{SHORT_MVA}d'))
-
-    fig.add_trace(go.Scatter(x=spy_ticker.get_price_history(TRADING_DAYS).index,
-                             y=golden_death_cross.long_avg,
-                             mode='lines', name=f'{LONG_MVA}d'))
-
-    # Add Buy/Sell signal markers
-    buy_signals, sell_signals = [], []
-    for i, signal in enumerate(golden_death_cross.signal):
-        if signal == "buy":
-            buy_signals.append(spy_ticker.get_price_history(TRADING_DAYS).index[i])
-        elif signal == "sell":
-            sell_signals.append(spy_ticker.get_price_history(TRADING_DAYS).index[i])
+    # Add SPY price and MVA traces
+    fig.add_trace(line_trace(dates, prices.values, 'SPY'))
+    fig.add_trace(line_trace(dates, short_avg, f'{SHORT_MVA}d'))
+    fig.add_trace(line_trace(dates, long_avg, f'{LONG_MVA}d'))
 
     # Add vertical lines for buy/sell signals
-    for signal in buy_signals:
-        fig.add_vline(x=signal, line=dict(color='green', width=2, dash='dash'))
-    for signal in sell_signals:
-        fig.add_vline(x=signal, line=dict(color='red', width=2, dash='dash'))
+    buy_indices, sell_indices = add_signal_segments(fig, dates, signal)
+    buy_signals, sell_signals = dates[buy_indices], dates[sell_indices]
 
     # Add buy/sell markers
-    fig.add_trace(go.Scatter(x=buy_signals, y=[spy_ticker.get_price_history(TRADING_DAYS).max()]*len(buy_signals),
+    fig.add_trace(go.Scatter(x=buy_signals, y=[prices.max()]*len(buy_signals),
                              mode='markers', name='Buy', marker=dict(size=10, color='green', symbol='triangle-up')))
-    fig.add_trace(go.Scatter(x=sell_signals, y=[spy_ticker.get_price_history(TRADING_DAYS).max()]*len(sell_signals),
+    fig.add_trace(go.Scatter(x=sell_signals, y=[prices.max()]*len(sell_signals),
                              mode='markers', name='Sell', marker=dict(size=10, color='red', symbol='triangle-down')))
 
     # Update layout
@@ -121,24 +103,19 @@ def plot_mva_results(spy_ticker, golden_death_cross, portfolio_values):
     fig.layout.xaxis.fixedrange = True
     fig.layout.yaxis.fixedrange = True
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def plot_trading_simulation_results(spy_ticker, golden_death_cross, portfolio_values):
+def plot_trading_simulation_results(dates, signal, portfolio_values):
     benchmark_values = np.array(portfolio_values['benchmark'])
     commision_values = np.array(portfolio_values['commission'])
     # no_commision_values = np.array(portfolio_values['no_commission'])
     death_cross_values = np.array(portfolio_values['death_cross'])
-    dates = spy_ticker.get_price_history(TRADING_DAYS).index
     fig = go.Figure()
     # Add SPY price trace
-    fig.add_trace(go.Scatter(x=dates, y=benchmark_values, mode='lines', name="BMark"))
-    fig.add_trace(go.Scatter(x=dates, y=commision_values, mode='lines', name="T. Com."))
-    fig.add_trace(go.Scatter(x=dates, y=death_cross_values, mode='lines', name="T. G&D"))
-    for i, signal in enumerate(golden_death_cross.signal):
-        if signal == "sell":
-            fig.add_vline(x=dates[i], line=dict(color='red', width=2, dash='dash'))
-        elif signal == "buy":
-            fig.add_vline(x=dates[i], line=dict(color='green', width=2, dash='dash'))
+    fig.add_trace(line_trace(dates, benchmark_values, "BMark"))
+    fig.add_trace(line_trace(dates, commision_values, "T. Com."))
+    fig.add_trace(line_trace(dates, death_cross_values, "T. G&D"))
+    add_signal_segments(fig, dates, signal)
 
     # Update layout with date-based x-axis
     fig.update_layout(
@@ -154,9 +131,26 @@ def plot_trading_simulation_results(spy_ticker, golden_death_cross, portfolio_va
     fig.layout.xaxis.fixedrange = True
     fig.layout.yaxis.fixedrange = True
 
-    st.plotly_chart(fig, use_container_width=True)
-
-
+    return fig
+
+def get_artifact_key():
+    return artifact_key(ARTIFACT_NAME, dict(
+        ticker=TICKER_SYMBOL, start_date=START_DATE, end_date=END_DATE, trading_days=TRADING_DAYS, start_cash=START_CASH,
+        short_mva=SHORT_MVA, long_mva=LONG_MVA, threshold=THRESHOLD, commission_rate=COMMISSION_RATE,
+        figure_points=FIGURE_POINTS, prices=price_source_key(START_DATE, END_DATE),
+    ), source_paths=[__file__])
+
+def build_artifact():
+    """
+    Runs the simulation and returns the figures and portfolio values of the page, see utils.artifacts.save_artifact
+    """
+    ticker_df = get_price_cache().history(TICKER_SYMBOL, START_DATE, END_DATE)
+    portfolio_values, history, signal, averages = run_trading_simulation(ticker_df)
+    figures = {
+        "mva": plot_mva_results(history, signal, averages),
+        "trading_simulation": plot_trading_simulation_results(history.index, signal, portfolio_values),
+    }
+    return dict(figures=figures, arrays={**portfolio_values, "signal": signal})
 
 # Main Streamlit application
 def main():
@@ -170,13 +164,14 @@ def main():
 
     st.markdown("*4 min read*")
 
-    # Fetch data
-    ticker_df = fetch_ticker_data(TICKER_SYMBOL, START_DATE, END_DATE)
-
-    if ticker_df is not None:
-        # Run simulation
-        portfolio_values, spy_ticker, golden_death_cross = run_trading_simulation(ticker_df)
+    try:
+        artifact = get_page_artifact(ARTIFACT_NAME, get_artifact_key, build_artifact)
+    except Exception as e:
+        logging.error(f"Error building the results for {TICKER_SYMBOL}: {e}")
+        st.error("Failed to fetch stock data. Please try again later.")
+        artifact = None
 
+    if artifact is not None:
         # Read overview from texts/golden_cross_death_cross/overview.md
         overview = open("src/pages/texts/golden_cross_death_cross/overview.md", "r").read()
         st.markdown(overview)
@@ -184,12 +179,12 @@ def main():
         mva = open("src/pages/texts/golden_cross_death_cross/mva.md", "r").read()
         st.markdown(mva)
         # Plot results
-        plot_mva_results(spy_ticker, golden_death_cross, portfolio_values)
+        st.plotly_chart(artifact.figure("mva"), use_container_width=True)
 
         backtest_conditions = open("src/pages/texts/golden_cross_death_cross/backtest_conditions.md", "r").read()
         st.markdown(backtest_conditions)
         # Plot trading simulation results
-        plot_trading_simulation_results(spy_ticker, golden_death_cross, portfolio_values)
+        st.plotly_chart(artifact.figure("trading_simulation"), use_container_width=True)
 
         analysis = open("src/pages/texts/golden_cross_death_cross/analysis.md", "r").read()
         st.markdown(analysis)
@@ -1,71 +1,211 @@
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import datetime
+from email.utils import parsedate_to_datetime
+import io
+import os
+import time
+from lxml import etree
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
 SAVE_PATH = "data/treasury_yield_curve.csv"
+PAGES_PATH = "data/cache/treasury/"
 YEARS_MIN = 1991
 YEARS_MAX = 2023
-SAVE_EVERY = 10
-TREASURY_DATA_URL = "https://home.treasury.gov/resource-center/data-chart-center/interest-rates/TextView?type=daily_treasury_yield_curve&field_tdr_date_value="
-SELECT_COLUMNS = ['Date', '3 Mo', '6 Mo', '1 Yr', '2 Yr', '3 Yr', '5 Yr', '7 Yr', '10 Yr', '30 Yr']
+# {year} is filled in, point it to a local server serving saved pages (<year>.html) for offline runs
+TREASURY_DATA_URL = "https://home.treasury.gov/resource-center/data-chart-center/interest-rates/TextView?type=daily_treasury_yield_curve&field_tdr_date_value={year}"
+SELECT_COLUMNS = ['Date', '3 Mo', '6 Mo', '1 Yr', '2 Yr', '3 Yr', '5 Yr', '7 Yr', '10 Yr', '20 Yr', '30 Yr']
+MAX_WORKERS = 8
+RETRIES = 4
+BACKOFF = 1.0
+# longest wait between two attempts, also caps a Retry-After sent by the server
+MAX_BACKOFF = 60
+TIMEOUT = 30
+# rate limited (treasury.gov answers 429 to too many concurrent workers) or server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
-def clean_text(text):
+def make_session(max_workers=MAX_WORKERS):
     """
-    Clean text by removing newlines and trailing whitespace.
+    Session with a connection pool large enough for max_workers concurrent requests.
     """
-    clean_text = text.replace('\n', '').strip()
-    if clean_text == "" or clean_text == "N/A":
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def retry_after(response):
+    """
+    Seconds to wait from the Retry-After header of a response (seconds or an HTTP date), None without one
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
         return None
-    return clean_text
+    return max((date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0)
 
-def text_to_date(text):
+def fetch_page(session, year, url=TREASURY_DATA_URL, retries=RETRIES, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
     """
-    Convert text to datetime object. (09/30/2021 -> 2021-09-30)
+    Get the HTML page of a year, retrying connection errors, 429 and 5xx responses
+    after backoff, 2 * backoff, 4 * backoff, ... seconds, or the Retry-After of the response,
+    never more than max_backoff seconds.
     """
-    return pd.to_datetime(text, format='%m/%d/%Y')
+    for attempt in range(retries + 1):
+        wait = backoff * 2 ** attempt
+        try:
+            response = session.get(url.format(year=year), timeout=TIMEOUT)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                return response.text
+            error = requests.HTTPError(f"{response.status_code} for {response.url}", response=response)
+            if retry_after(response) is not None:
+                wait = retry_after(response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt < retries:
+            time.sleep(min(wait, max_backoff))
+    raise error
 
-def text_to_float(text):
+def get_page(session, year, url=TREASURY_DATA_URL, pages_path=PAGES_PATH, refresh=False):
     """
-    Convert text to float. (0.01% -> 0.0001)
+    Get the HTML page of a year, checkpointed to <pages_path>/<year>.html.
+    Checkpoints are reused unless refresh is set, the page of the running year is always fetched again.
     """
-    if text is None:
-        return None
-    return float(text)
+    page_path = os.path.join(pages_path, f"{year}.html")
+    if not refresh and year < datetime.date.today().year and os.path.exists(page_path):
+        with open(page_path, "r") as f:
+            return f.read()
+
+    text = fetch_page(session, year, url)
+    os.makedirs(pages_path, exist_ok=True)
+    # write then rename, an interrupted run never leaves a partial checkpoint
+    with open(page_path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(page_path + ".tmp", page_path)
+    return text
+
+def parse_treasury_page(text):
+    """
+    Stream the cells of the first table of a Treasury page, the page is never built as a full tree.
+
+    returns
+    (headers, rows) with the stripped text of every <th> and every <tbody> row of <td>
+    """
+    headers, rows = [], []
+    events = etree.iterparse(io.BytesIO(text.encode("utf-8")), events=("end",), tag=("th", "td", "tr", "table"),
+                             html=True, encoding="utf-8")
+    row = []
+    for _, element in events:
+        if element.tag == "table":
+            break
+        if element.tag == "th":
+            headers.append("".join(element.itertext()).strip())
+        elif element.tag == "td":
+            row.append("".join(element.itertext()).strip())
+        elif row:
+            rows.append(row)
+            row = []
+        # parsed cells are dropped, memory stays bounded by one row
+        if element.tag == "tr":
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    return headers, rows
 
-def get_treasury_data_df(year):
+def get_treasury_data_df(year, session=None, url=TREASURY_DATA_URL, pages_path=PAGES_PATH, refresh=False):
     """
     Get treasury yield curve data for a given year. Base URL defined in TREASURY_DATA_URL.
+    Yields are converted column by column, empty and N/A cells become NaN.
     """
-    response = requests.get(TREASURY_DATA_URL + str(year))
-    soup = BeautifulSoup(response.text, 'html.parser')
+    session = make_session() if session is None else session
+    headers, rows = parse_treasury_page(get_page(session, year, url, pages_path, refresh))
+    # columns missing in older years (20 Yr before 1993) are left empty
+    df = pd.DataFrame(rows, columns=headers).reindex(columns=SELECT_COLUMNS)
+    df["Date"] = pd.to_datetime(df["Date"], format='%m/%d/%Y')
+    df[SELECT_COLUMNS[1:]] = df[SELECT_COLUMNS[1:]].apply(pd.to_numeric, errors="coerce")
+    return df
 
-    table = soup.find('table')
-    headers = [clean_text(col_name.text) for col_name in table.find('thead').find('tr').find_all('th')]
-    data = []
-    for row in table.find('tbody').find_all('tr'):
-        data.append([clean_text(value.text) for value in row.find_all('td')])
-    return pd.DataFrame(data, columns=headers)
+def scrape_years(years, url=TREASURY_DATA_URL, pages_path=PAGES_PATH, max_workers=MAX_WORKERS, refresh=False):
+    """
+    Scrape the given years concurrently, returns the DataFrames in the order of years.
+    """
+    session = make_session(max_workers)
 
-def main():
-    print("Scraping Treasury Yield Curve data...")
+    def scrape_year(year):
+        df = get_treasury_data_df(year, session, url, pages_path, refresh)
+        print(f"Scraped data for {year}")
+        return df
 
-    dfs = []
-    for year in range(YEARS_MIN, YEARS_MAX + 1):
-        print(f"Scraping data for {year}")
+    with ThreadPoolExecutor(max_workers) as pool:
+        return list(pool.map(scrape_year, years))
 
-        df = get_treasury_data_df(year)[SELECT_COLUMNS]
-        # save every SAVE_EVERY days (to avoid memory issues)
-        df = df.iloc[::SAVE_EVERY]
-        df["Date"] = df["Date"].apply(text_to_date)
-        for col in df.columns[1:]:
-            df[col] = df[col].apply(text_to_float)
-        dfs.append(df)
+def last_saved_date(save_path=SAVE_PATH):
+    """
+    Date of the last row of the saved CSV, None if there is no CSV yet.
+    """
+    if not os.path.exists(save_path):
+        return None
+    dates = pd.read_csv(save_path, usecols=["Date"])["Date"]
+    return pd.Timestamp(dates.iloc[-1]) if len(dates) else None
+
+def update(save_path=SAVE_PATH, url=TREASURY_DATA_URL, pages_path=PAGES_PATH, max_workers=MAX_WORKERS, end_year=None):
+    """
+    Incremental mode, scrape only the days after the last row of save_path and append them.
+    """
+    last_date = last_saved_date(save_path)
+    if last_date is None:
+        return scrape(save_path, url=url, pages_path=pages_path, max_workers=max_workers)
+
+    end_year = datetime.date.today().year if end_year is None else end_year
+    # the year of the last row may be incomplete, fetch it again
+    dfs = scrape_years(range(last_date.year, end_year + 1), url, pages_path, max_workers, refresh=True)
+    df = pd.concat(dfs, ignore_index=True).sort_values("Date")
+    df = df[df["Date"] > last_date]
+    df.to_csv(save_path, mode="a", header=False, index=False, date_format="%Y-%m-%d")
 
-    df = pd.concat(dfs, ignore_index=True)
-    df.to_csv(SAVE_PATH, index=False)
+    print(f"{len(df)} rows appended to {save_path}")
+    return df
 
-    print(f"Data saved to {SAVE_PATH}")
+def scrape(save_path=SAVE_PATH, start_year=YEARS_MIN, end_year=YEARS_MAX, url=TREASURY_DATA_URL,
+           pages_path=PAGES_PATH, max_workers=MAX_WORKERS):
+    """
+    Scrape every year from start_year to end_year and rewrite save_path.
+    """
+    dfs = scrape_years(range(start_year, end_year + 1), url, pages_path, max_workers)
+    df = pd.concat([df.sort_values("Date") for df in dfs], ignore_index=True)
+    df.to_csv(save_path, index=False, date_format="%Y-%m-%d")
+
+    print(f"Data saved to {save_path}")
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape the Treasury daily yield curve rates.")
+    parser.add_argument("--incremental", action="store_true", help="only append the days after the last saved row")
+    parser.add_argument("--start-year", type=int, default=YEARS_MIN)
+    parser.add_argument("--end-year", type=int, default=None, help=f"defaults to {YEARS_MAX}, or the running year with --incremental")
+    parser.add_argument("--url", default=os.environ.get("TREASURY_DATA_URL", TREASURY_DATA_URL),
+                        help="page URL with a {year} placeholder, also read from TREASURY_DATA_URL")
+    parser.add_argument("--pages-path", default=PAGES_PATH, help="checkpoint directory of the fetched pages")
+    parser.add_argument("--save-path", default=SAVE_PATH)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    print("Scraping Treasury Yield Curve data...")
+    if args.incremental:
+        update(args.save_path, args.url, args.pages_path, args.workers, args.end_year)
+    else:
+        end_year = YEARS_MAX if args.end_year is None else args.end_year
+        scrape(args.save_path, args.start_year, end_year, args.url, args.pages_path, args.workers)
 
 if __name__ == "__main__":
     main()
@@ -1,2 +1,16 @@
-from .ticker import StockTicker
-from .trader import Trader
+import importlib
+
+# the classes are imported on first access, importing a single utils module does not load pandas
+_EXPORTS = {
+    "StockTicker": ".ticker",
+    "MultiStockTicker": ".ticker",
+    "Trader": ".trader",
+    "MultiAssetTrader": ".trader",
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
@@ -0,0 +1,146 @@
+import functools
+import glob
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+ARTIFACTS_PATH = "data/artifacts/"
+# bump when the layout of the artifacts changes, it invalidates every saved artifact
+ARTIFACT_VERSION = 4
+# code shared by the pages, its source is part of every artifact key
+UTILS_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_digest(path):
+    """
+    sha256 of the content of a file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_digest(paths):
+    """
+    sha256 of the .py files at paths, directories are walked recursively.
+    Files are named relative to the parent of their path, so the digest does not depend on where the repository is.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        path = os.path.abspath(path)
+        file_paths = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, "**", "*.py"), recursive=True))
+        for file_path in file_paths:
+            digest.update(os.path.relpath(file_path, os.path.dirname(path)).encode())
+            digest.update(file_digest(file_path).encode())
+    return digest.hexdigest()
+
+
+def artifact_key(name, params, input_paths=(), source_paths=()):
+    """
+    Key of an artifact, the hash of its name, its parameters (JSON-serializable), the content of its input files
+    and the source of the code building it: the source_paths (usually the page module, __file__) and the utils package.
+    Any edit of that code, like a plotting or strategy change, gives a new key and the artifact is rebuilt.
+
+    ARTIFACT_VERSION only needs a bump when the layout of the saved artifacts changes (Artifact, save_artifact),
+    or when results depend on code outside the page and utils, e.g. a new version of a library.
+    """
+    payload = {
+        "version": ARTIFACT_VERSION,
+        "name": name,
+        "params": params,
+        "inputs": {path: file_digest(path) for path in input_paths},
+        "sources": source_digest([UTILS_PATH, *source_paths]),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class Artifact:
+    # saved results of a page: plotly figures as JSON files, arrays in arrays.npz and
+    # JSON-serializable data in meta.json. Figures and arrays are only read when requested.
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.figure_names = meta["figures"]
+        self.data = meta["data"]
+        self._arrays = None
+
+    def figure(self, name):
+        import plotly.io as pio
+        with open(os.path.join(self.path, "figures", f"{name}.json"), "r") as f:
+            return pio.from_json(f.read())
+
+    def array(self, name):
+        if self._arrays is None:
+            self._arrays = np.load(os.path.join(self.path, "arrays.npz"))
+        return self._arrays[name]
+
+
+def save_artifact(name, key, figures=None, arrays=None, data=None, path=ARTIFACTS_PATH):
+    """
+    Saves an artifact to <path>/<name>/<key>/, replacing a previous build of the same key
+    """
+    figures = figures or {}
+    artifact_path = os.path.join(path, name, key)
+    # built in a temporary directory and renamed, a page never sees a partial artifact
+    tmp_path = artifact_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_path, "figures"))
+    for figure_name, fig in figures.items():
+        with open(os.path.join(tmp_path, "figures", f"{figure_name}.json"), "w") as f:
+            f.write(fig.to_json())
+    np.savez(os.path.join(tmp_path, "arrays.npz"), **(arrays or {}))
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"name": name, "key": key, "figures": list(figures), "data": data or {}}, f, default=str)
+
+    shutil.rmtree(artifact_path, ignore_errors=True)
+    os.replace(tmp_path, artifact_path)
+    return artifact_path
+
+
+def load_artifact(name, key, path=ARTIFACTS_PATH):
+    """
+    Returns the Artifact saved under name and key, None if it was not built
+    """
+    artifact_path = os.path.join(path, name, key)
+    if not os.path.exists(os.path.join(artifact_path, "meta.json")):
+        return None
+    return Artifact(artifact_path)
+
+
+def get_artifact(name, key, build, path=ARTIFACTS_PATH):
+    """
+    Returns the saved Artifact of name and key. When it was not built yet, build() is run and its
+    result, a dict of save_artifact arguments (figures, arrays, data), is saved first.
+    """
+    artifact = load_artifact(name, key, path)
+    if artifact is None:
+        save_artifact(name, key, path=path, **build())
+        artifact = load_artifact(name, key, path)
+    return artifact
+
+
+@functools.cache
+def _page_artifact_loader():
+    # streamlit is only needed by the pages, not by src/build_artifacts.py
+    import streamlit as st
+
+    # cached once per artifact name for the life of the server, the functions (leading underscore) are not hashed
+    @st.cache_resource
+    def load(name, _get_key, _build):
+        return get_artifact(name, _get_key(), _build)
+
+    return load
+
+
+def get_page_artifact(name, get_key, build):
+    """
+    Artifact of a Streamlit page, read from data/artifacts/ (built by src/build_artifacts.py) or built on
+    the first visit, see get_artifact. get_key and build are the get_artifact_key and build_artifact of the page,
+    they are called once per server.
+    """
+    return _page_artifact_loader()(name, get_key, build)
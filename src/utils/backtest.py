@@ -0,0 +1,145 @@
+import numpy as np
+
+# signal codes used by the vectorized backtest
+HOLD = 0
+BUY = 1
+SELL = -1
+SIGNAL_LABELS = {BUY: "buy", SELL: "sell", HOLD: "hold"}
+
+
+def to_signal_codes(signals):
+    """
+    Convert a sequence of "buy"/"sell"/"hold" signals to an int8 array of BUY/SELL/HOLD codes.
+    Integer arrays are assumed to already hold codes.
+    """
+    signals = np.asarray(signals)
+    if signals.dtype.kind in "iub":
+        return signals.astype(np.int8)
+    codes = np.full(signals.shape, HOLD, dtype=np.int8)
+    codes[signals == "buy"] = BUY
+    codes[signals == "sell"] = SELL
+    return codes
+
+
+def to_signal_labels(codes):
+    """
+    Convert an array of BUY/SELL/HOLD codes back to an array of "buy"/"sell"/"hold" strings.
+    """
+    codes = np.asarray(codes)
+    labels = np.full(codes.shape, SIGNAL_LABELS[HOLD], dtype="<U4")
+    labels[codes == BUY] = SIGNAL_LABELS[BUY]
+    labels[codes == SELL] = SIGNAL_LABELS[SELL]
+    return labels
+
+
+def _market_value(holdings, prices):
+    # days without a price (NaN) only count when shares are actually held
+    return np.where(holdings == 0, 0, holdings * prices)
+
+
+def backtest_fixed_buys(prices, amounts, cash, commission=0):
+    """
+    Vectorized equivalent of calling Trader.buy(amounts[i]) on every day i.
+    Buys are capped by the remaining cash, commission is a % of the amount.
+    prices can be a (days,) array or a (days, tickers) matrix with one cash slot per ticker,
+    NaN prices mark days a ticker cannot be traded.
+
+    returns
+    cash: array of cash after each day
+    holdings: array of shares held after each day
+    portfolio_value: array of cash + holdings * price
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    amounts = np.broadcast_to(np.asarray(amounts, dtype=np.float64), prices.shape)
+    amounts = np.where(np.isnan(prices), 0, amounts)
+
+    # total cash spent so far, capped once the trader runs out of cash
+    spent = np.minimum(np.cumsum(amounts * (1 + commission), axis=0), cash)
+    spent_per_day = np.diff(spent, axis=0, prepend=0)
+
+    shares_bought = np.where(spent_per_day > 0, spent_per_day / (1 + commission) / prices, 0)
+    holdings = np.cumsum(shares_bought, axis=0)
+    cash = cash - spent
+    return cash, holdings, cash + _market_value(holdings, prices)
+
+
+def backtest_buy_and_hold(prices, cash, commission=0):
+    """
+    Vectorized equivalent of Trader.buy(cash) on the first day and holding afterwards.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    amounts = np.zeros(prices.shape)
+    amounts[0] = cash
+    return backtest_fixed_buys(prices, amounts, cash, commission)
+
+
+def _apply_order(cash, holdings, price, code, commission, buy_fraction, sell_fraction):
+    # single ticker, same arithmetic as Trader.buy / Trader.sell
+    if code == BUY:
+        amount = cash * buy_fraction
+        if cash < amount * (1 + commission):
+            amount = cash / (1 + commission)
+        holdings += amount / price
+        cash -= amount * (1 + commission)
+    elif code == SELL:
+        amount = min(holdings * sell_fraction, holdings)
+        holdings -= amount
+        cash += amount * price * (1 - commission)
+    return cash, holdings
+
+
+def _apply_orders(cash, holdings, price, code, commission, buy_fraction, sell_fraction):
+    # one step over every ticker at once, tickers without an order keep their state
+    buy = code == BUY
+    sell = code == SELL
+
+    amount = cash * buy_fraction
+    amount = np.where(cash < amount * (1 + commission), cash / (1 + commission), amount)
+    holdings = np.where(buy, holdings + amount / price, holdings)
+    cash = np.where(buy, cash - amount * (1 + commission), cash)
+
+    amount = np.minimum(holdings * sell_fraction, holdings)
+    cash = np.where(sell, cash + amount * price * (1 - commission), cash)
+    holdings = np.where(sell, holdings - amount, holdings)
+    return cash, holdings
+
+
+def backtest_signals(prices, signals, cash, commission=0, buy_fraction=0.5, sell_fraction=0.5):
+    """
+    Vectorized equivalent of Trader.buy(cash * buy_fraction) on "buy" signals
+    and Trader.sell(holdings * sell_fraction) on "sell" signals.
+    prices and signals can be (days,) arrays or (days, tickers) matrices with one cash slot per ticker.
+    Only the days with a signal are stepped through, applying the orders of every ticker at once,
+    the rest is forward filled.
+
+    returns
+    cash: array of cash after each day
+    holdings: array of shares held after each day
+    portfolio_value: array of cash + holdings * price
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    codes = to_signal_codes(signals)
+    codes = np.where(np.isnan(prices), HOLD, codes)
+    event_days = np.flatnonzero((codes != HOLD).reshape(len(codes), -1).any(axis=1))
+
+    # slot 0 holds the starting state, slot i + 1 the state after the i-th signal day
+    event_cash = np.empty((len(event_days) + 1,) + prices.shape[1:])
+    event_holdings = np.empty((len(event_days) + 1,) + prices.shape[1:])
+    if prices.ndim == 1:
+        holdings = 0.0
+        apply_orders = _apply_order
+    else:
+        cash = np.broadcast_to(np.asarray(cash, dtype=np.float64), prices.shape[1:]).copy()
+        holdings = np.zeros(prices.shape[1:])
+        apply_orders = _apply_orders
+    event_cash[0], event_holdings[0] = cash, holdings
+    for i, day in enumerate(event_days):
+        cash, holdings = apply_orders(cash, holdings, prices[day], codes[day], commission, buy_fraction, sell_fraction)
+        event_cash[i + 1] = cash
+        event_holdings[i + 1] = holdings
+
+    # number of signal days at or before each day picks the state slot to forward fill
+    slot = np.searchsorted(event_days, np.arange(len(prices)), side="right")
+    cash = event_cash[slot]
+    holdings = event_holdings[slot]
+    return cash, holdings, cash + _market_value(holdings, prices)
@@ -0,0 +1,96 @@
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from utils.event_study import ESTIMATION_WINDOW, EVENT_WINDOW, windowed_event_study
+from utils.shared_arrays import SharedArrays, init_worker, worker_state
+
+
+def _study_columns(tasks, returns, factors, risk_free, benchmark_returns, estimation_window, event_window):
+    # tasks are (column, event_indices) pairs, every column is one ticker
+    dfs = []
+    for column, event_indices in tasks:
+        df = windowed_event_study(returns[:, column], event_indices, factors, risk_free, benchmark_returns,
+                                  estimation_window, event_window)
+        df.insert(0, "column", column)
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def _study_worker_columns(tasks):
+    arrays = worker_state["arrays"]
+    return _study_columns(tasks, arrays["returns"], arrays.get("factors"), arrays.get("risk_free"),
+                          arrays.get("benchmark_returns"), **worker_state["config"])
+
+
+def cross_sectional_event_study(returns, event_columns, event_indices, factors=None, risk_free=None, benchmark_returns=None,
+                                estimation_window=ESTIMATION_WINDOW, event_window=EVENT_WINDOW, processes=None, chunksize=16):
+    """
+    Runs windowed_event_study for many events across many tickers.
+    returns is a (days, tickers) matrix, event_columns and event_indices give the ticker column and row of every event.
+    The return, factor and benchmark arrays are put in shared memory once and the tickers are spread
+    over a process pool. processes=1 runs in the current process.
+
+    returns
+    DataFrame with one row per event, see windowed_event_study, plus the column of the ticker
+    """
+    event_columns = np.asarray(event_columns)
+    event_indices = np.asarray(event_indices)
+    tasks = [(column, event_indices[event_columns == column]) for column in np.unique(event_columns)]
+    config = dict(estimation_window=estimation_window, event_window=event_window)
+
+    if processes == 1 or len(tasks) <= 1:
+        return _study_columns(tasks, returns, factors, risk_free, benchmark_returns, **config)
+
+    arrays = {"returns": returns, "factors": factors, "risk_free": risk_free, "benchmark_returns": benchmark_returns}
+    arrays = {key: np.asarray(array, dtype=np.float64) for key, array in arrays.items() if array is not None}
+    chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(shared.handles, config)) as pool:
+            return pd.concat(pool.map(_study_worker_columns, chunks), ignore_index=True)
+
+
+def aggregate_event_study(results_df, n_coef, estimation_window=ESTIMATION_WINDOW):
+    """
+    Aggregates the events of windowed_event_study / cross_sectional_event_study, events with NaN CAR are skipped
+    with a warning. n_coef is the number of fitted coefficients (factors + intercept) of the model, the residual
+    degrees of freedom of every event come from its n_estimation rows (the full estimation window without it).
+
+    returns
+    Series of
+    N: number of events
+    CAAR: cumulative average abnormal return
+    patell_z, patell_p: Patell test on the standardized CARs
+    bmp_t, bmp_p: Boehmer, Musumeci & Poulsen standardized cross-sectional test
+    cs_t, cs_p: cross-sectional t-test on the CARs
+    p-values are two-sided.
+    """
+    skipped = int(results_df["CAR"].isna().sum())
+    if skipped:
+        warnings.warn(f"{skipped} of {len(results_df)} events have no CAR (incomplete windows or missing data) and are skipped")
+    results_df = results_df.dropna(subset=["CAR"])
+    n = len(results_df)
+    car = results_df["CAR"].values
+    scar = results_df["z_score"].values
+
+    # the standardized CARs follow a t distribution with the residual degrees of freedom of their fit
+    if "n_estimation" in results_df:
+        dof = results_df["n_estimation"].values - n_coef
+    else:
+        dof = np.full(n, estimation_window[1] - estimation_window[0] - n_coef)
+    patell_z = scar.sum() / np.sqrt(np.sum(dof / (dof - 2)))
+    bmp_t = scar.mean() / (scar.std(ddof=1) / np.sqrt(n))
+    cs_t = car.mean() / (car.std(ddof=1) / np.sqrt(n))
+
+    return pd.Series({
+        "N": n,
+        "CAAR": car.mean(),
+        "patell_z": patell_z,
+        "patell_p": 2 * stats.norm.sf(abs(patell_z)),
+        "bmp_t": bmp_t,
+        "bmp_p": 2 * stats.t.sf(abs(bmp_t), n - 1),
+        "cs_t": cs_t,
+        "cs_p": 2 * stats.t.sf(abs(cs_t), n - 1),
+    })
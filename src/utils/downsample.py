@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def lttb_indices(y, n_out, x=None):
+    """
+    Indices of the n_out points kept by Largest-Triangle-Three-Buckets downsampling of y.
+    The first and last points are always kept, every bucket in between keeps the point forming the largest
+    triangle with the point kept before it and the average of the next bucket, so peaks and drops survive.
+    x defaults to the positions of the points. NaN points (e.g. moving average warm-up) are kept as gaps.
+
+    returns
+    sorted int array of indices, all indices when y has no more than n_out points
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # n_out - 2 buckets between the first and last point, the last bucket is followed by the last point
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    # prefix sums give the average of the valid points of any bucket in O(1)
+    valid = ~np.isnan(y)
+    sum_x = np.concatenate([[0], np.cumsum(np.where(valid, x, 0))])
+    sum_y = np.concatenate([[0], np.cumsum(np.where(valid, y, 0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        start, end, next_end = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        count = counts[next_end] - counts[end]
+        if count:
+            next_x = (sum_x[next_end] - sum_x[end]) / count
+            next_y = (sum_y[next_end] - sum_y[end]) / count
+        else:
+            next_x, next_y = x[end], y[end]
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        # NaN areas (NaN points) lose against any real triangle, an all-NaN bucket keeps its first point
+        a = start + np.argmax(np.nan_to_num(areas, nan=-1.0))
+        indices[bucket + 1] = a
+    return indices
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.factor_models import FACTOR_MODELS, fit_factor_model, get_factors, model_comparison
+from utils.factor_store import FF_FACTORS_PATH, get_factor_store
+from utils.prices import get_price_cache
+from utils.returns import simple_returns
+
+EVENT_WINDOW = [2, 3]
+# estimation window as [start, end) offsets from the event day, ending before the event window starts
+ESTIMATION_WINDOW = [-260, -10]
+
+
+def _moving_average(ar_returns, event_window):
+    # moving average over the event window, same as np.convolve(..., mode='valid') on every column
+    window = event_window[0] + event_window[1]
+    return sliding_window_view(ar_returns, window, axis=0).mean(axis=-1)
+
+
+def get_AR_CMR(returns, event_window=EVENT_WINDOW):
+    """
+    returns is an array of returns, or a (days, tickers) matrix fitted in one solve
+
+    returns
+    model_returns: array of returns by the model
+    ar_returns: array of abnormal returns
+    ar_std: standard deviation of the abnormal returns
+    mva_ar_returns: array of moving average of abnormal returns
+    """
+    fit = fit_factor_model(returns)
+    ar_std = np.std(fit.residuals, axis=0)
+    mva_ar_returns = _moving_average(fit.residuals, event_window)
+    return fit.model_returns, ar_std, fit.residuals, mva_ar_returns
+
+
+def get_AR_CAPM(returns, market_returns, event_window=EVENT_WINDOW):
+    """
+    returns is an array of returns, or a (days, tickers) matrix fitted in one solve
+
+    returns
+    model_returns: array of returns by the model
+    ar_returns: array of abnormal returns
+    mva_ar_returns: array of moving average of abnormal returns
+    """
+    factors, risk_free = get_factors("CAPM", market_returns, None)
+    fit = fit_factor_model(returns, factors, risk_free)
+    ar_std = np.std(fit.residuals, axis=0)
+    mva_ar_returns = _moving_average(fit.residuals, event_window)
+    return fit.model_returns, fit.residuals, ar_std, mva_ar_returns
+
+
+def load_ff_factors(start_date, end_date, path=FF_FACTORS_PATH):
+    """
+    Returns the daily Fama-French factors between start_date and end_date, indexed by date.
+    Factors are converted from percent to decimal returns.
+    """
+    return get_factor_store(path).to_frame(start_date, end_date)
+
+
+def get_AR_FF(returns, market_returns, ff_coeff_df, event_window=EVENT_WINDOW):
+    """
+    returns is an array of returns, or a (days, tickers) matrix fitted in one solve.
+    The three factor betas are estimated jointly.
+
+    returns
+    model_returns: array of returns by the model
+    ar_returns: array of abnormal returns
+    ar_std: standard deviation of the abnormal returns
+    mva_ar_returns: array of moving average of abnormal returns
+    """
+    factors, risk_free = get_factors("FF", market_returns, ff_coeff_df)
+    fit = fit_factor_model(returns, factors, risk_free)
+    ar_std = np.std(fit.residuals, axis=0)
+    mva_ar_returns = _moving_average(fit.residuals, event_window)
+    return fit.model_returns, fit.residuals, ar_std, mva_ar_returns
+
+
+def _prefix_sums(values):
+    # prefix[i] is the sum of values[:i], so a window [a, b) sums to prefix[b] - prefix[a]
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+
+def windowed_event_study(returns, event_indices, factors=None, risk_free=None, benchmark_returns=None,
+                         estimation_window=ESTIMATION_WINDOW, event_window=EVENT_WINDOW):
+    """
+    Event study where every event gets its own model fitted on the estimation window before it.
+    Cross products, returns and log returns are accumulated into prefix sums once, so the OLS fit,
+    CAR, BHAR and z-score of each event are O(1) in the window lengths, and all events are solved at once.
+
+    returns: (days,) array of returns of one ticker
+    event_indices: row of each event day
+    factors, risk_free: as in fit_factor_model
+    benchmark_returns: (days,) array, BHAR is computed against buy and hold of the benchmark if given
+    estimation_window: [start, end) offsets from the event day of the rows used for the fit
+    event_window: days before and after the event day, the event window is rows [event - before, event + after)
+
+    Rows with a NaN return or factor (e.g. before the ticker was listed) are left out of the estimation window,
+    they only make NaN the events whose event window contains them.
+
+    returns
+    DataFrame with one row per event: alpha, sigma (residual std of the fit), CAR, z_score, BHAR and
+    n_estimation (rows used for the fit). Events without a full event window, or with an estimation window
+    out of the data or with no more valid rows than coefficients, are NaN.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    y = returns if risk_free is None else returns - np.asarray(risk_free, dtype=np.float64)
+    design = np.ones((len(returns), 1))
+    if factors is not None:
+        design = np.column_stack([design, np.asarray(factors, dtype=np.float64)])
+    n_coef = design.shape[1]
+
+    # missing rows are zeroed, they then add nothing to the prefix sums and are counted apart
+    ok = np.isfinite(y) & np.isfinite(design).all(axis=1)
+    y = np.where(ok, y, 0)
+    design = np.where(ok[:, None], design, 0)
+    n_ok = _prefix_sums(ok.astype(np.float64))
+
+    xx = _prefix_sums(design[:, :, None] * design[:, None, :])
+    xy = _prefix_sums(design * y[:, None])
+    yy = _prefix_sums(y ** 2)
+    x = _prefix_sums(design)
+    ys = _prefix_sums(y)
+
+    events = np.asarray(event_indices)
+    valid = ((events + estimation_window[0] >= 0) & (estimation_window[1] <= -event_window[0])
+             & (events + event_window[1] <= len(returns)))
+    # windows of the events within the data, the others stay NaN
+    e = events[valid]
+    est_rows = n_ok[e + estimation_window[1]] - n_ok[e + estimation_window[0]]
+    event_rows = n_ok[e + event_window[1]] - n_ok[e - event_window[0]]
+    valid[valid] = (est_rows > n_coef) & (event_rows == event_window[0] + event_window[1])
+    e = events[valid]
+    est_start, est_end = e + estimation_window[0], e + estimation_window[1]
+    event_start, event_end = e - event_window[0], e + event_window[1]
+    n_estimation = n_ok[est_end] - n_ok[est_start]
+
+    # OLS fit of every estimation window from the windowed X'X and X'y
+    xtx = xx[est_end] - xx[est_start]
+    xty = xy[est_end] - xy[est_start]
+    coef = np.linalg.solve(xtx, xty[:, :, None])[:, :, 0]
+    ssr = yy[est_end] - yy[est_start] - 2 * np.einsum("ei,ei->e", coef, xty) + np.einsum("ei,eij,ej->e", coef, xtx, coef)
+    sigma = np.sqrt(np.maximum(ssr, 0) / (n_estimation - n_coef))
+
+    # CAR is the summed return minus the summed model return over the event window
+    car = ys[event_end] - ys[event_start] - np.einsum("ei,ei->e", x[event_end] - x[event_start], coef)
+    z_score = car / (sigma * np.sqrt(event_end - event_start))
+
+    results = {"alpha": coef[:, 0], "sigma": sigma, "CAR": car, "z_score": z_score}
+    if benchmark_returns is not None:
+        benchmark_returns = np.asarray(benchmark_returns, dtype=np.float64)
+        # a missing benchmark return only makes the BHAR of the events around it NaN
+        benchmark_ok = _prefix_sums(np.isfinite(benchmark_returns).astype(np.float64))
+        log_growth = _prefix_sums(np.log1p(np.where(np.isfinite(returns), returns, 0)))
+        benchmark_log_growth = _prefix_sums(np.log1p(np.where(np.isfinite(benchmark_returns), benchmark_returns, 0)))
+        bhar = (np.exp(log_growth[event_end] - log_growth[event_start])
+                - np.exp(benchmark_log_growth[event_end] - benchmark_log_growth[event_start]))
+        complete = benchmark_ok[event_end] - benchmark_ok[event_start] == event_end - event_start
+        results["BHAR"] = np.where(complete, bhar, np.nan)
+    results["n_estimation"] = n_estimation
+
+    results_df = pd.DataFrame({"event_index": events})
+    for column, values in results.items():
+        results_df[column] = np.nan
+        results_df.loc[valid, column] = values
+    return results_df
+
+
+class EventStudyContext:
+    # benchmark returns and Fama-French factors are loaded once and shared by every ticker of the study
+    def __init__(self, start_date, end_date, tickers=(), benchmark="^GSPC", event_window=EVENT_WINDOW, max_workers=8):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.benchmark = benchmark
+        self.event_window = event_window
+        self.max_workers = max_workers
+        self.price_cache = get_price_cache()
+
+        # benchmark and event tickers are fetched together as one (dates x tickers) frame of closes
+        self.closes = self.price_cache.history_many([benchmark] + list(tickers), start_date, end_date, max_workers=max_workers)
+        dates = self.closes[benchmark].dropna().index
+        # only the benchmark trading days with factors, the Fama-French file can end before end_date
+        # or miss a day the exchange was open, NaN factors would break the regressions
+        ff_coeff_df = load_ff_factors(start_date, end_date)
+        has_factors = pd.DatetimeIndex(dates.date).isin(ff_coeff_df.index)
+        if not has_factors.any():
+            raise ValueError(f"No Fama-French factors for the {benchmark} trading days between {start_date} and {end_date}")
+        self.dates = dates[has_factors]
+        self.market_returns = simple_returns(self.closes[benchmark].reindex(self.dates).values)
+        self.ff_coeff_df = ff_coeff_df.reindex(pd.DatetimeIndex(self.dates.date))
+
+    def get_prices(self, ticker):
+        return self.price_cache.history(ticker, self.start_date, self.end_date)
+
+    def get_returns_matrix(self, tickers):
+        """
+        Returns a (days, tickers) matrix of returns aligned on the benchmark dates
+        """
+        missing = [ticker for ticker in tickers if ticker not in self.closes]
+        if missing:
+            closes = self.price_cache.history_many(missing, self.start_date, self.end_date, max_workers=self.max_workers)
+            self.closes = pd.concat([self.closes, closes], axis=1)
+        return simple_returns(self.closes[list(tickers)].reindex(self.dates).values)
+
+    def fit_FF(self, tickers):
+        """
+        Fits the FF model for all tickers in one batched job
+
+        returns
+        dict of ticker to (model_returns, ar_returns, ar_std, mva_ar_returns)
+        """
+        returns = self.get_returns_matrix(tickers)
+        model_returns, ar_returns, ar_std, mva_ar_returns = get_AR_FF(returns, self.market_returns, self.ff_coeff_df, self.event_window)
+        return {
+            ticker: (model_returns[:, i], ar_returns[:, i], ar_std[i], mva_ar_returns[:, i])
+            for i, ticker in enumerate(tickers)
+        }
+
+    def windowed_event_study(self, ticker, event_dates, model="FF", estimation_window=ESTIMATION_WINDOW):
+        """
+        Runs windowed_event_study for the events of a ticker, BHAR is measured against the benchmark
+        """
+        dates = pd.DatetimeIndex(self.dates.date)
+        event_indices = dates.get_indexer(pd.to_datetime(event_dates))
+        returns = self.get_returns_matrix([ticker])[:, 0]
+        factors, risk_free = get_factors(model, self.market_returns, self.ff_coeff_df)
+        results_df = windowed_event_study(returns, event_indices, factors, risk_free, self.market_returns,
+                                          estimation_window, self.event_window)
+        results_df.insert(0, "event_date", pd.to_datetime(event_dates))
+        return results_df
+
+    def cross_sectional_event_study(self, events, model="FF", estimation_window=ESTIMATION_WINDOW, processes=None):
+        """
+        Runs the windowed event study for events, a dict of ticker to event dates, across all tickers at once
+
+        returns
+        results_df: DataFrame with one row per event
+        summary: Series of CAAR and the aggregated test statistics, see cross_sectional.aggregate_event_study
+        """
+        from utils.cross_sectional import aggregate_event_study, cross_sectional_event_study
+
+        tickers = list(events.keys())
+        dates = pd.DatetimeIndex(self.dates.date)
+        event_tickers = [ticker for ticker in tickers for _ in events[ticker]]
+        event_dates = pd.to_datetime([date for ticker in tickers for date in events[ticker]])
+        event_columns = [tickers.index(ticker) for ticker in event_tickers]
+
+        returns = self.get_returns_matrix(tickers)
+        factors, risk_free = get_factors(model, self.market_returns, self.ff_coeff_df)
+        results_df = cross_sectional_event_study(returns, event_columns, dates.get_indexer(event_dates), factors, risk_free,
+                                                 self.market_returns, estimation_window, self.event_window, processes)
+        # rows come back grouped by ticker, map them back to the ticker and date of the event
+        order = np.argsort(event_columns, kind="stable")
+        results_df.insert(0, "ticker", np.array(event_tickers)[order])
+        results_df.insert(1, "event_date", event_dates[order])
+        results_df = results_df.drop(columns="column")
+
+        n_coef = 1 + len(FACTOR_MODELS[model])
+        return results_df, aggregate_event_study(results_df, n_coef, estimation_window)
+
+    def model_comparison(self, tickers, models=("CMR", "CAPM", "FF")):
+        """
+        Returns a DataFrame of MSE and R2 indexed by (ticker, model)
+        """
+        returns = self.get_returns_matrix(tickers)
+        return model_comparison(returns, self.market_returns, self.ff_coeff_df, tickers, models)
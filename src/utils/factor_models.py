@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from utils.returns import excess_returns
+
+# factors of each model besides the intercept, "Mkt-RF" is the benchmark return over the risk-free rate
+# and the other columns come from the Fama-French factor data
+FACTOR_MODELS = {
+    "CMR": [],
+    "CAPM": ["Mkt"],
+    "FF": ["Mkt-RF", "SMB", "HML"],
+    "FF5": ["Mkt-RF", "SMB", "HML", "RMW", "CMA"],
+    "Carhart": ["Mkt-RF", "SMB", "HML", "Mom"],
+}
+
+
+class FactorModelFit:
+    # alphas and r2 have one value per ticker, betas one row per factor,
+    # model_returns and residuals have the shape of the fitted returns
+    def __init__(self, alphas, betas, model_returns, residuals, r2):
+        self.alphas = alphas
+        self.betas = betas
+        self.model_returns = model_returns
+        self.residuals = residuals
+        self.r2 = r2
+
+
+def fit_factor_model(returns, factors=None, risk_free=None):
+    """
+    Fits returns - risk_free = alpha + factors @ betas + residuals by ordinary least squares.
+    returns is a (days,) array or a (days, tickers) matrix, all tickers are solved by one lstsq call.
+    factors is a (days, factors) matrix, None fits the constant mean return model.
+
+    returns
+    FactorModelFit, with model_returns including the risk-free rate again
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    y = returns if risk_free is None else excess_returns(returns, risk_free)
+    design = np.ones((len(returns), 1))
+    if factors is not None:
+        design = np.column_stack([design, np.asarray(factors, dtype=np.float64)])
+
+    coef = np.linalg.lstsq(design, y, rcond=None)[0]
+    fitted = design @ coef
+    residuals = y - fitted
+    r2 = 1 - np.sum(residuals ** 2, axis=0) / np.sum((y - y.mean(axis=0)) ** 2, axis=0)
+    if factors is None:
+        # the constant mean explains nothing by definition, avoid -0.00 from rounding errors
+        r2 = np.zeros_like(r2)
+    return FactorModelFit(coef[0], coef[1:], returns - residuals, residuals, r2)
+
+
+def get_factors(model, market_returns, ff_coeff_df):
+    """
+    Returns the (factors, risk_free) of the model for fit_factor_model.
+    CAPM uses the raw benchmark returns, assuming a risk-free rate of 0.
+    """
+    names = FACTOR_MODELS[model]
+    if not names:
+        return None, None
+    market_returns = np.asarray(market_returns, dtype=np.float64)
+    if model == "CAPM":
+        return market_returns[:, None], None
+
+    risk_free = ff_coeff_df["RF"].values
+    columns = [market_returns - risk_free] + [ff_coeff_df[name].values for name in names[1:]]
+    return np.column_stack(columns), risk_free
+
+
+def model_comparison(returns, market_returns, ff_coeff_df, tickers, models=("CMR", "CAPM", "FF")):
+    """
+    Returns a DataFrame of MSE and R2 indexed by (ticker, model).
+    returns is the (days, tickers) matrix of the tickers.
+    """
+    results = {}
+    for model in models:
+        factors, risk_free = get_factors(model, market_returns, ff_coeff_df)
+        fit = fit_factor_model(returns, factors, risk_free)
+        mse = np.mean(fit.residuals ** 2, axis=0)
+        for i, ticker in enumerate(tickers):
+            results[(ticker, model)] = [mse[i], fit.r2[i]]
+    results_df = pd.DataFrame(results, index=["MSE", "R2"]).T
+    return results_df.loc[[(ticker, model) for ticker in tickers for model in models]]
@@ -0,0 +1,69 @@
+from functools import lru_cache
+import os
+import numpy as np
+import pandas as pd
+
+from utils.stores import is_fresh, read_meta, write_meta
+
+FF_FACTORS_PATH = "data/F-F_Research_Data_Factors_daily.csv"
+FACTOR_STORE_PATH = "data/cache/ff_factors/"
+
+
+def date_to_int(date):
+    """
+    Convert a date to a yyyymmdd integer (2024-07-31 -> 20240731), integers are returned as they are
+    """
+    if isinstance(date, (int, np.integer)):
+        return date
+    date = pd.Timestamp(date)
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+class FactorStore:
+    # Fama-French factors converted once from the CSV into one .npy file per column, memory-mapped when opened.
+    # Dates are sorted yyyymmdd integers, so a range query is two binary searches and zero-copy slices.
+    # Factors are stored as decimal returns (the CSV is in percent).
+    def __init__(self, csv_path=FF_FACTORS_PATH, path=FACTOR_STORE_PATH):
+        self.csv_path = csv_path
+        self.path = path
+        if not is_fresh(path, csv_path):
+            self._build()
+
+        self.factor_names = read_meta(path)["columns"]
+        self.dates = np.load(os.path.join(path, "date.npy"), mmap_mode="r")
+        self.factors = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in self.factor_names}
+
+    def _build(self):
+        df = pd.read_csv(self.csv_path).sort_values("date")
+        os.makedirs(self.path, exist_ok=True)
+        np.save(os.path.join(self.path, "date.npy"), df["date"].values.astype(np.int64))
+        names = [name for name in df.columns if name != "date"]
+        for name in names:
+            np.save(os.path.join(self.path, f"{name}.npy"), df[name].values.astype(np.float64) / 100)
+        # meta.json is written last, it marks the store as complete
+        write_meta(self.path, self.csv_path, columns=names)
+
+    def query(self, start_date, end_date, columns=None):
+        """
+        Returns the dates between start_date and end_date (both included) and a dict of column to factor values.
+        The arrays are read-only views of the memory-mapped files.
+        """
+        start = np.searchsorted(self.dates, date_to_int(start_date), side="left")
+        end = np.searchsorted(self.dates, date_to_int(end_date), side="right")
+        columns = self.factor_names if columns is None else columns
+        return self.dates[start:end], {name: self.factors[name][start:end] for name in columns}
+
+    def to_frame(self, start_date, end_date, columns=None):
+        """
+        Returns the factors between start_date and end_date as a DataFrame indexed by date
+        """
+        dates, factors = self.query(start_date, end_date, columns)
+        return pd.DataFrame(factors, index=pd.to_datetime(dates.astype(str), format="%Y%m%d").rename("date"))
+
+
+@lru_cache
+def get_factor_store(csv_path=FF_FACTORS_PATH, path=FACTOR_STORE_PATH):
+    """
+    Returns the FactorStore of the process, opened once
+    """
+    return FactorStore(csv_path, path)
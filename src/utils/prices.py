@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+from urllib.parse import quote
+import pandas as pd
+from dotenv import load_dotenv
+
+PRICE_CACHE_PATH = "data/cache/prices/"
+PRICE_FIXTURE_PATH = "data/fixtures/prices/"
+
+
+def _slice(df, start, end):
+    # [start, end) like yfinance history, compared on the local (naive) dates
+    dates = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    return df[(dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))]
+
+
+def _file_name(symbol):
+    # symbols like ^GSPC are not safe file names
+    return quote(symbol, safe="")
+
+
+def _fetch_concurrently(history, symbols, start, end, max_workers):
+    # bounded thread pool, the fetches are dominated by network round trips
+    symbols = list(dict.fromkeys(symbols))
+    with ThreadPoolExecutor(max_workers) as pool:
+        dfs = pool.map(lambda symbol: history(symbol, start, end), symbols)
+        return dict(zip(symbols, dfs))
+
+
+class PriceProvider:
+    # source of daily price history, returns a DataFrame indexed by date with a Close column
+    def history(self, symbol, start, end):
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+
+    def history(self, symbol, start, end):
+        import yfinance as yahooFinance
+        return yahooFinance.Ticker(symbol).history(start=start, end=end)
+
+
+class FixtureProvider(PriceProvider):
+    # reads <path>/<symbol>.csv or .parquet saved from a previous history() call, no network needed
+    def __init__(self, path=PRICE_FIXTURE_PATH):
+        self.path = path
+
+    def history(self, symbol, start, end):
+        file_path = os.path.join(self.path, _file_name(symbol))
+        if os.path.exists(file_path + ".parquet"):
+            df = pd.read_parquet(file_path + ".parquet")
+        elif os.path.exists(file_path + ".csv"):
+            df = pd.read_csv(file_path + ".csv", index_col=0)
+            # keep only the date part, offsets can differ between rows (daylight saving time)
+            df.index = pd.to_datetime(df.index.str[:10])
+        else:
+            raise FileNotFoundError(f"No price fixture for {symbol} in {self.path}")
+        return _slice(df, start, end)
+
+    def save(self, symbol, df):
+        os.makedirs(self.path, exist_ok=True)
+        df.to_parquet(os.path.join(self.path, _file_name(symbol) + ".parquet"))
+
+
+class PriceCache:
+    # persistent Parquet cache in front of a provider, one file per symbol plus the date range it covers.
+    # Requests outside the covered range only fetch the missing head and tail, which are merged in.
+    def __init__(self, provider, path=PRICE_CACHE_PATH):
+        self.provider = provider
+        self.path = path
+        self.ranges_path = os.path.join(path, "ranges.json")
+        # ranges.json is shared by all symbols, guard it when fetching concurrently
+        self.ranges_lock = threading.Lock()
+
+    def _read_ranges(self):
+        if not os.path.exists(self.ranges_path):
+            return {}
+        with open(self.ranges_path, "r") as f:
+            return json.load(f)
+
+    def _write_ranges(self, ranges):
+        with open(self.ranges_path, "w") as f:
+            json.dump(ranges, f, indent=2)
+
+    def history(self, symbol, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # dates after today can still get new prices, so they are never marked as covered
+        range_start, range_end = start, min(end, pd.Timestamp.today().normalize())
+        file_path = os.path.join(self.path, _file_name(symbol) + ".parquet")
+        with self.ranges_lock:
+            ranges = self._read_ranges()
+
+        if symbol in ranges and os.path.exists(file_path):
+            cached_start, cached_end = (pd.Timestamp(date) for date in ranges[symbol])
+            if cached_start <= start and end <= cached_end:
+                return _slice(pd.read_parquet(file_path), start, end)
+
+            dfs = [pd.read_parquet(file_path)]
+            if start < cached_start:
+                dfs.append(self.provider.history(symbol, start, cached_start))
+            if end > cached_end:
+                dfs.append(self.provider.history(symbol, cached_end, end))
+            range_start, range_end = min(range_start, cached_start), max(range_end, cached_end)
+        else:
+            dfs = [self.provider.history(symbol, start, end)]
+
+        df = pd.concat([df for df in dfs if len(df)] or dfs[:1])
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+
+        os.makedirs(self.path, exist_ok=True)
+        df.to_parquet(file_path)
+        with self.ranges_lock:
+            ranges = self._read_ranges()
+            ranges[symbol] = [str(range_start.date()), str(max(range_start, range_end).date())]
+            self._write_ranges(ranges)
+        return _slice(df, start, end)
+
+    def history_many(self, symbols, start, end, column="Close", max_workers=8):
+        """
+        Returns one wide DataFrame (dates x symbols) of the column, aligned on the union of dates.
+        Symbols are fetched through the cache with at most max_workers concurrent requests.
+        """
+        dfs = _fetch_concurrently(self.history, symbols, start, end, max_workers)
+        return pd.concat({symbol: df[column] for symbol, df in dfs.items()}, axis=1).sort_index()
+
+
+def price_source_key(start=None, end=None):
+    """
+    JSON-serializable description of the prices returned for [start, end): the configured provider and the range.
+    A range that is not over yet also holds today's date, new prices can still come in.
+    """
+    load_dotenv()
+    provider = os.environ.get("PRICE_PROVIDER", "yahoo")
+    key = {"provider": provider}
+    if provider == "fixture":
+        key["fixture_path"] = os.environ.get("PRICE_FIXTURE_PATH", PRICE_FIXTURE_PATH)
+    if start is not None or end is not None:
+        key["range"] = [str(start), str(end)]
+        today = pd.Timestamp.today().normalize()
+        if end is None or pd.Timestamp(end) > today:
+            key["today"] = str(today.date())
+    return key
+
+
+def get_price_cache():
+    """
+    Returns the PriceCache configured by the environment.
+    PRICE_PROVIDER selects "yahoo" (default) or "fixture" (offline, reads PRICE_FIXTURE_PATH),
+    PRICE_CACHE_PATH overrides where the cache is stored. Variables are also read from .env.
+    """
+    load_dotenv()
+    if os.environ.get("PRICE_PROVIDER", "yahoo") == "fixture":
+        provider = FixtureProvider(os.environ.get("PRICE_FIXTURE_PATH", PRICE_FIXTURE_PATH))
+    else:
+        provider = YahooProvider()
+    return PriceCache(provider, os.environ.get("PRICE_CACHE_PATH", PRICE_CACHE_PATH))
@@ -0,0 +1,43 @@
+import numpy as np
+
+# Returns are computed along the first axis, so prices can be a (days,) array or a (days, tickers) matrix.
+# returns[t] is the return from day t to day t + periods. With pad=True the last `periods` days, which have
+# no future price, are filled with 0 so the returns keep the length of the prices (the event study convention).
+
+
+def _pad(returns, periods, pad):
+    if not pad:
+        return returns
+    padding = np.zeros((periods,) + returns.shape[1:])
+    return np.concatenate([returns, padding])
+
+
+def simple_returns(prices, periods=1, pad=True):
+    """
+    Simple returns p[t + periods] / p[t] - 1
+    """
+    if periods <= 0:
+        raise ValueError("periods must be greater than 0")
+    prices = np.asarray(prices, dtype=np.float64)
+    return _pad(prices[periods:] / prices[:-periods] - 1, periods, pad)
+
+
+def log_returns(prices, periods=1, pad=True):
+    """
+    Log returns log(p[t + periods] / p[t])
+    """
+    if periods <= 0:
+        raise ValueError("periods must be greater than 0")
+    prices = np.asarray(prices, dtype=np.float64)
+    return _pad(np.log(prices[periods:]) - np.log(prices[:-periods]), periods, pad)
+
+
+def excess_returns(returns, risk_free):
+    """
+    Returns over the risk-free rate, risk_free is a scalar or one rate per day shared by every ticker
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    risk_free = np.asarray(risk_free, dtype=np.float64)
+    if returns.ndim > 1 and risk_free.ndim == 1:
+        risk_free = risk_free[:, None]
+    return returns - risk_free
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class RollingMean:
+    # running mean over the last `window` values, kept in a ring buffer
+    def __init__(self, window, resum_every=1000):
+        if window <= 0:
+            raise ValueError("window must be greater than 0")
+        self.window = window
+        self.resum_every = resum_every
+        self.buffer = np.zeros(window)
+        self.count = 0 # number of values pushed so far
+        self.total = 0.0
+
+    def is_full(self):
+        return self.count >= self.window
+
+    def push(self, value):
+        pos = self.count % self.window
+        self.total += value - self.buffer[pos]
+        self.buffer[pos] = value
+        self.count += 1
+        # re-sum the buffer now and then so floating point errors do not accumulate
+        if self.count % self.resum_every == 0:
+            self.total = self.buffer.sum()
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / min(self.count, self.window)
+
+
+def rolling_mean(values, window):
+    """
+    Simple moving average over the whole array, NaN until `window` values are available.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window <= 0:
+        raise ValueError("window must be greater than 0")
+    averages = np.full(len(values), np.nan)
+    if window <= len(values):
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        averages[window-1:] = (sums[window:] - sums[:-window]) / window
+    return averages
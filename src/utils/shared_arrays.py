@@ -0,0 +1,53 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+# arrays and config of the pool the current worker process belongs to, set once by init_worker
+worker_state = {}
+
+
+class SharedArrays:
+    # named arrays copied once into shared memory, worker processes attach to them through `handles`
+    # instead of receiving pickled copies. Use as a context manager so the memory is released.
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.handles = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+            self.blocks[key] = shm
+            self.handles[key] = (shm.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+
+def attach_shared_arrays(handles):
+    """
+    Returns (arrays, blocks) for the handles of a SharedArrays.
+    The blocks must stay referenced for as long as the arrays are used.
+    """
+    arrays, blocks = {}, []
+    for key, (name, shape, dtype) in handles.items():
+        shm = shared_memory.SharedMemory(name=name)
+        blocks.append(shm)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return arrays, blocks
+
+
+def init_worker(handles, config):
+    """
+    Initializer of the worker processes of a pool, pass initargs=(shared.handles, config).
+    Attaches the arrays of the SharedArrays and keeps them in worker_state["arrays"], with config in worker_state["config"].
+    """
+    worker_state["arrays"], worker_state["blocks"] = attach_shared_arrays(handles)
+    worker_state["config"] = config
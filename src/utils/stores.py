@@ -0,0 +1,38 @@
+import json
+import os
+
+# Stores convert a CSV once into .npy files under their path. meta.json, written last, marks a store
+# as complete and records the stamp of the CSV it was built from, the store is rebuilt when the CSV changes.
+META_FILE = "meta.json"
+
+
+def csv_stamp(csv_path):
+    """
+    Size and modification time of a file, they change whenever the file is rewritten
+    """
+    stat = os.stat(csv_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def is_fresh(path, csv_path):
+    """
+    True when the store at path is complete and was built from the current content of csv_path
+    """
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r") as f:
+        return json.load(f)["csv"] == csv_stamp(csv_path)
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE), "r") as f:
+        return json.load(f)
+
+
+def write_meta(path, csv_path, **meta):
+    """
+    Writes meta.json of the store with the stamp of csv_path, call it once every file of the store is written
+    """
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump({"csv": csv_stamp(csv_path), **meta}, f)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from utils.backtest import HOLD
+from utils.strategy.indicators import IndicatorCache
+
+
+class Strategy:
+    # vectorized strategy: declares the indicators it needs and turns them into
+    # BUY/SELL/HOLD codes for the whole price series in one call
+    def indicators(self):
+        """
+        Indicators used by the strategy, a list of (name, *params) tuples, see utils.strategy.indicators
+        """
+        return []
+
+    def signals(self, cache):
+        """
+        int8 array of BUY/SELL/HOLD codes, one per price of the cache
+        """
+        raise NotImplementedError
+
+    def run(self, prices=None, cache=None):
+        """
+        Signals of the strategy over prices, or over the prices of cache. Pass the same IndicatorCache
+        to several strategies on the same prices to compute their common indicators once.
+        Passing both requires prices to be the prices of the cache.
+        """
+        if cache is None:
+            if prices is None:
+                raise ValueError("prices or cache is required")
+            cache = IndicatorCache(prices)
+        elif prices is not None and prices is not cache.prices and not np.array_equal(
+                np.asarray(prices, dtype=np.float64), cache.prices, equal_nan=True):
+            raise ValueError("prices differ from the prices of the cache")
+        cache.compute(self.indicators())
+        return self.signals(cache)
+
+
+class BarStrategy(Strategy):
+    # adapter for strategies that keep state from one bar to the next (positions, stops, ...):
+    # start is called once with the cache, then on_bar for every bar in order
+    def start(self, cache):
+        pass
+
+    def on_bar(self, index, cache):
+        """
+        Code of the bar at index, only data up to index may be used
+        """
+        raise NotImplementedError
+
+    def signals(self, cache):
+        self.start(cache)
+        codes = np.full(len(cache.prices), HOLD, dtype=np.int8)
+        for index in range(len(codes)):
+            codes[index] = self.on_bar(index, cache)
+        return codes
@@ -1,35 +1,155 @@
+import numpy as np
+
+from utils.backtest import BUY, SELL, HOLD, to_signal_labels
+from utils.rolling import RollingMean
+from utils.strategy.base import Strategy
+
+
 class GoldenAndDeathCrossStrategy:
 
-    def __init__(self, stock_ticker, short_window, long_window, threshold):
+    def __init__(self, stock_ticker, short_window, long_window, threshold, streaming=False, capacity=None):
         self.stock_ticker = stock_ticker
         self.short_window = short_window
         self.long_window = long_window
         self.threshold = threshold
-        self.signal = []
 
-        self.slow_avg = []
-        self.long_avg = []
+        # one slot per bar of the ticker, preallocated and grown by doubling if more bars come in:
+        # BUY/SELL/HOLD codes and the averages, NaN during warm-up
+        capacity = len(stock_ticker.prices) if capacity is None else capacity
+        self.n_bars = 0
+        self._signal = np.full(max(capacity, 1), HOLD, dtype=np.int8)
+        self._slow_avg = np.full(max(capacity, 1), np.nan)
+        self._long_avg = np.full(max(capacity, 1), np.nan)
 
-    def get_signal(self):
-        if self.stock_ticker.index < self.long_window - 1:
-            self.signal.append("hold")
-            self.slow_avg.append(None)
-            self.long_avg.append(None)
-            return None
+        # streaming mode updates both averages in O(1) per bar instead of re-slicing the history,
+        # get_signal must then be called on every bar starting from the first one
+        self.streaming = streaming
+        self.short_mean = RollingMean(short_window)
+        self.long_mean = RollingMean(long_window)
+
+    @property
+    def signal_codes(self):
+        # int8 BUY/SELL/HOLD codes of the bars seen so far, a view on the preallocated array
+        return self._signal[:self.n_bars]
+
+    @property
+    def slow_avg_values(self):
+        # float64 views, NaN during warm-up
+        return self._slow_avg[:self.n_bars]
+
+    @property
+    def long_avg_values(self):
+        return self._long_avg[:self.n_bars]
 
+    # lists of the former implementation, built from the arrays on every access:
+    # "buy"/"sell"/"hold" signals and averages with None during warm-up
+    @property
+    def signal(self):
+        return to_signal_labels(self.signal_codes).tolist()
+
+    @property
+    def slow_avg(self):
+        return [None if np.isnan(avg) else avg for avg in self.slow_avg_values.tolist()]
+
+    @property
+    def long_avg(self):
+        return [None if np.isnan(avg) else avg for avg in self.long_avg_values.tolist()]
+
+    def _append(self, code, slow_avg=np.nan, long_avg=np.nan):
+        if self.n_bars == len(self._signal):
+            self._signal = np.concatenate([self._signal, np.full(self.n_bars, HOLD, dtype=np.int8)])
+            self._slow_avg = np.concatenate([self._slow_avg, np.full(self.n_bars, np.nan)])
+            self._long_avg = np.concatenate([self._long_avg, np.full(self.n_bars, np.nan)])
+        self._signal[self.n_bars] = code
+        self._slow_avg[self.n_bars] = slow_avg
+        self._long_avg[self.n_bars] = long_avg
+        self.n_bars += 1
+
+    def _get_averages(self):
         prev_short_avg = self.stock_ticker.get_price_history(self.short_window+1)[:self.short_window].mean()
         prev_long_avg = self.stock_ticker.get_price_history(self.long_window+1)[:self.long_window].mean()
         short_avg = self.stock_ticker.get_price_history(self.short_window).mean()
         long_avg = self.stock_ticker.get_price_history(self.long_window).mean()
+        return prev_short_avg, prev_long_avg, short_avg, long_avg
+
+    def _update_averages(self):
+        # previous averages are read before the new price is pushed, a window that was
+        # not full yet falls back to the current average like the history slicing does
+        prev_short_avg = self.short_mean.mean() if self.short_mean.is_full() else None
+        prev_long_avg = self.long_mean.mean() if self.long_mean.is_full() else None
+
+        price = self.stock_ticker.get_price()
+        self.short_mean.push(price)
+        self.long_mean.push(price)
+
+        short_avg = self.short_mean.mean()
+        long_avg = self.long_mean.mean()
+        if prev_short_avg is None:
+            prev_short_avg = short_avg
+        if prev_long_avg is None:
+            prev_long_avg = long_avg
+        return prev_short_avg, prev_long_avg, short_avg, long_avg
+
+    def get_signal(self):
+        if self.streaming:
+            prev_short_avg, prev_long_avg, short_avg, long_avg = self._update_averages()
 
-        self.slow_avg.append(short_avg)
-        self.long_avg.append(long_avg)
+        if self.stock_ticker.index < self.long_window - 1:
+            self._append(HOLD)
+            return None
+
+        if not self.streaming:
+            prev_short_avg, prev_long_avg, short_avg, long_avg = self._get_averages()
 
         if short_avg > long_avg * (1 + self.threshold) and prev_short_avg < prev_long_avg * (1 + self.threshold):
-            self.signal.append("buy")
+            self._append(BUY, short_avg, long_avg)
             return "buy"
         if short_avg < long_avg * (1 - self.threshold) and prev_short_avg > prev_long_avg * (1 - self.threshold):
-            self.signal.append("sell")
+            self._append(SELL, short_avg, long_avg)
             return "sell"
-        self.signal.append("hold")
+        self._append(HOLD, short_avg, long_avg)
         return None
+
+
+def golden_death_cross_signals(short_avg, long_avg, threshold):
+    """
+    Vectorized GoldenAndDeathCrossStrategy signals from precomputed moving averages
+    (NaN during warm-up). Returns an int8 array of BUY/SELL/HOLD codes.
+    """
+    short_avg = np.asarray(short_avg, dtype=np.float64)
+    long_avg = np.asarray(long_avg, dtype=np.float64)
+
+    # previous bar averages, falling back to the current one on the first bar of a window
+    prev_short_avg = np.concatenate(([np.nan], short_avg[:-1]))
+    prev_long_avg = np.concatenate(([np.nan], long_avg[:-1]))
+    prev_short_avg = np.where(np.isnan(prev_short_avg), short_avg, prev_short_avg)
+    prev_long_avg = np.where(np.isnan(prev_long_avg), long_avg, prev_long_avg)
+
+    upper, lower = 1 + threshold, 1 - threshold
+    buy = (short_avg > long_avg * upper) & (prev_short_avg < prev_long_avg * upper)
+    sell = (short_avg < long_avg * lower) & (prev_short_avg > prev_long_avg * lower)
+
+    codes = np.full(len(short_avg), HOLD, dtype=np.int8)
+    codes[buy] = BUY
+    codes[sell & ~buy] = SELL
+    return codes
+
+
+class GoldenDeathCross(Strategy):
+    # vectorized GoldenAndDeathCrossStrategy over a whole price series
+    def __init__(self, short_window, long_window, threshold):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.threshold = threshold
+
+    def indicators(self):
+        return [("sma", self.short_window), ("sma", self.long_window)]
+
+    def averages(self, cache):
+        """
+        Short and long moving averages, NaN during warm-up
+        """
+        return cache.get("sma", self.short_window), cache.get("sma", self.long_window)
+
+    def signals(self, cache):
+        return golden_death_cross_signals(*self.averages(cache), self.threshold)
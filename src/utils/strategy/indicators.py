@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from utils.rolling import rolling_mean
+
+# Indicators over a whole price array, NaN during warm-up so they stay aligned with the prices
+
+
+def _seeded_ewm(values, alpha, window):
+    # exponential moving average seeded with the mean of the first `window` valid values,
+    # NaN before the seed (leading NaN values, e.g. the warm-up of another indicator, are skipped)
+    values = np.asarray(values, dtype=np.float64)
+    averages = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0 or valid[0] + window > len(values):
+        return averages
+    seed = valid[0] + window - 1
+    tail = values[seed:].copy()
+    tail[0] = values[valid[0]:seed + 1].mean()
+    averages[seed:] = pd.Series(tail).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return averages
+
+
+def sma(prices, window):
+    """
+    Simple moving average, see utils.rolling.rolling_mean
+    """
+    return rolling_mean(prices, window)
+
+
+def ema(prices, span):
+    """
+    Exponential moving average with alpha = 2 / (span + 1), seeded with the simple average of the first span prices
+    """
+    if span <= 0:
+        raise ValueError("span must be greater than 0")
+    return _seeded_ewm(prices, 2 / (span + 1), span)
+
+
+def rsi(prices, window=14):
+    """
+    Relative Strength Index with Wilder smoothing (alpha = 1 / window), between 0 and 100
+
+    returns
+    array, NaN for the first window prices
+    """
+    if window <= 0:
+        raise ValueError("window must be greater than 0")
+    changes = np.diff(np.asarray(prices, dtype=np.float64), prepend=np.nan)
+    gains = _seeded_ewm(np.where(changes > 0, changes, np.where(np.isnan(changes), np.nan, 0)), 1 / window, window)
+    losses = _seeded_ewm(np.where(changes < 0, -changes, np.where(np.isnan(changes), np.nan, 0)), 1 / window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + gains / losses)
+    # no losses: maximal strength, or neutral when the prices did not move at all
+    return np.where(losses == 0, np.where(gains == 0, 50.0, 100.0), values)
+
+
+def bollinger(prices, window=20, num_std=2):
+    """
+    Bollinger bands, the simple moving average +/- num_std rolling standard deviations (population)
+
+    returns
+    middle, upper, lower arrays
+    """
+    middle = rolling_mean(prices, window)
+    std = pd.Series(np.asarray(prices, dtype=np.float64)).rolling(window).std(ddof=0).to_numpy()
+    return middle, middle + num_std * std, middle - num_std * std
+
+
+def macd(prices, fast=12, slow=26, signal=9):
+    """
+    Moving Average Convergence Divergence
+
+    returns
+    macd: fast EMA - slow EMA
+    signal: EMA of the macd line over `signal` periods
+    histogram: macd - signal
+    """
+    line = ema(prices, fast) - ema(prices, slow)
+    signal_line = _seeded_ewm(line, 2 / (signal + 1), signal)
+    return line, signal_line, line - signal_line
+
+
+INDICATORS = {
+    "sma": sma,
+    "ema": ema,
+    "rsi": rsi,
+    "bollinger": bollinger,
+    "macd": macd,
+}
+
+
+class IndicatorCache:
+    # indicators of one price series, each (name, params) is computed on the first request only,
+    # so strategies sharing the cache never compute the same indicator twice
+    def __init__(self, prices):
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)
+        self._values = {}
+
+    def get(self, name, *params):
+        key = (name, params)
+        if key not in self._values:
+            if name not in INDICATORS:
+                raise ValueError(f"unknown indicator {name!r}, expected one of {list(INDICATORS)}")
+            self._values[key] = INDICATORS[name](self.prices, *params)
+        return self._values[key]
+
+    def compute(self, indicators):
+        """
+        Computes the (name, *params) indicators not computed yet
+        """
+        for name, *params in indicators:
+            self.get(name, *params)
+
+    def __contains__(self, key):
+        name, *params = key
+        return (name, tuple(params)) in self._values
@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from utils.backtest import backtest_signals
+from utils.rolling import rolling_mean
+from utils.shared_arrays import SharedArrays, init_worker, worker_state
+from utils.strategy.golden_death_cross import golden_death_cross_signals
+
+RESULT_COLUMNS = ["short_window", "long_window", "threshold", "commission", "final_value", "max_drawdown", "n_trades"]
+
+
+def max_drawdown(values):
+    """
+    Largest drop from a running peak, as a fraction of the peak.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    peaks = np.maximum.accumulate(values)
+    return np.max(1 - values / peaks)
+
+
+def count_trades(cash, holdings, starting_cash):
+    """
+    Number of days where an order was filled, i.e. the cash or the holdings of backtest_signals changed,
+    starting from starting_cash and no holdings. Signals that cannot trade (selling without holdings,
+    buying without enough cash) are not counted.
+    """
+    changed = (np.diff(cash, prepend=starting_cash) != 0) | (np.diff(holdings, prepend=0) != 0)
+    return int(np.count_nonzero(changed))
+
+
+def _evaluate_worker_chunk(grid):
+    arrays = worker_state["arrays"]
+    return _evaluate_chunk(grid, arrays["prices"], arrays["averages"], **worker_state["config"])
+
+
+def _evaluate_chunk(grid, prices, averages, window_rows, commissions, cash, buy_fraction, sell_fraction):
+    rows = []
+    for short_window, long_window, threshold in grid:
+        signals = golden_death_cross_signals(averages[window_rows[short_window]], averages[window_rows[long_window]], threshold)
+        for commission in commissions:
+            cash_values, holdings, values = backtest_signals(prices, signals, cash, commission, buy_fraction, sell_fraction)
+            rows.append((short_window, long_window, threshold, commission, values[-1], max_drawdown(values),
+                         count_trades(cash_values, holdings, cash)))
+    return rows
+
+
+def sweep_golden_death_cross(prices, short_windows, long_windows, thresholds, commissions=(0,),
+                             cash=10000, buy_fraction=0.5, sell_fraction=0.5, processes=None, chunksize=64):
+    """
+    Backtest GoldenAndDeathCrossStrategy for every (short_window, long_window, threshold, commission)
+    combination with short_window < long_window. The trader buys cash * buy_fraction on "buy" and sells
+    holdings * sell_fraction on "sell", like the death cross trader of the golden cross page.
+
+    Moving averages of every window are computed once and shared with the worker processes,
+    together with the prices, through shared memory. processes=1 runs in the current process.
+
+    returns
+    DataFrame with one row per combination: final_value, max_drawdown and n_trades, see count_trades
+    """
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    windows = sorted(set(short_windows) | set(long_windows))
+    window_rows = {window: row for row, window in enumerate(windows)}
+    averages = np.stack([rolling_mean(prices, window) for window in windows])
+
+    grid = [(short_window, long_window, threshold)
+            for short_window in short_windows
+            for long_window in long_windows
+            for threshold in thresholds
+            if short_window < long_window]
+    config = dict(window_rows=window_rows, commissions=tuple(commissions), cash=cash,
+                  buy_fraction=buy_fraction, sell_fraction=sell_fraction)
+
+    if processes == 1:
+        rows = _evaluate_chunk(grid, prices, averages, **config)
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+    chunks = [grid[i:i + chunksize] for i in range(0, len(grid), chunksize)]
+    with SharedArrays({"prices": prices, "averages": averages}) as shared:
+        with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(shared.handles, config)) as pool:
+            rows = [row for chunk_rows in pool.map(_evaluate_worker_chunk, chunks) for row in chunk_rows]
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
@@ -1,16 +1,33 @@
-class StockTicker:
+import numpy as np
+import pandas as pd
+
 
-    def __init__(self, df):
+class StockTicker:
+    # single ticker stepped day by day. The prices are held as one contiguous float64 array and
+    # every lookup is positional, history windows are views on it. Pandas objects are only
+    # built by get_price_history_series.
+    def __init__(self, df, column="Close"):
         self.df = df
+        self.column = column
+        self.dates = df.index
+        self.prices = np.ascontiguousarray(df[column].values, dtype=np.float64)
         self.index = 0
-        self.date = df.index[self.index]
+        self._date_index, self._date = None, None
+
+    @property
+    def date(self):
+        # building the Timestamp is the slowest lookup, it is only done once per day and on request
+        if self._date_index != self.index:
+            self._date_index, self._date = self.index, self.dates[self.index]
+        return self._date
 
     def next_day(self):
+        if self.index + 1 >= len(self.prices):
+            raise IndexError("no price after the last day")
         self.index += 1
-        self.date = self.df.index[self.index]
 
     def get_price(self):
-        return self.df.loc[self.date].Close
+        return self.prices[self.index]
 
     def get_date(self):
         return self.date
@@ -19,10 +36,48 @@ class StockTicker:
         if days <= 0:
             raise ValueError("days must be greater than 0")
         days = min(days, self.index+1)
-        return self.df.loc[self.df.index[self.index-days+1]: self.df.index[self.index]].Close
+        return self.prices[self.index-days+1: self.index+1]
+
+    def get_price_history_series(self, days):
+        # same window as get_price_history, as a Series indexed by date
+        days = len(self.get_price_history(days))
+        return self.df[self.column].iloc[self.index-days+1: self.index+1]
 
     def get_prev_price(self):
-        return self.df.loc[self.index - 1].Close
+        if self.index == 0:
+            raise IndexError("no price before the first day")
+        return self.prices[self.index - 1]
 
     def get_next_price(self):
-        return self.df.loc[self.index + 1].Close
+        return self.prices[self.index + 1]
+
+
+class MultiStockTicker:
+    # N tickers held as one aligned (dates x tickers) float64 price matrix,
+    # prices are forward filled and NaN before a ticker's first price
+    def __init__(self, dfs, column="Close"):
+        prices = pd.concat({symbol: df[column] for symbol, df in dfs.items()}, axis=1).sort_index().ffill()
+        self.symbols = list(prices.columns)
+        self.dates = prices.index
+        self.prices = np.ascontiguousarray(prices.values, dtype=np.float64)
+        self.index = 0
+        self.date = self.dates[self.index]
+
+    def next_day(self):
+        self.index += 1
+        self.date = self.dates[self.index]
+
+    def get_price(self):
+        return self.prices[self.index]
+
+    def get_date(self):
+        return self.date
+
+    def get_price_history(self, days):
+        if days <= 0:
+            raise ValueError("days must be greater than 0")
+        days = min(days, self.index+1)
+        return self.prices[self.index-days+1: self.index+1]
+
+    def to_frame(self):
+        return pd.DataFrame(self.prices, index=self.dates, columns=self.symbols)
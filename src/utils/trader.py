@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Trader:
     # have a class to hold information about holding, cash, and portfolio value
     def __init__(self, cash, stock_ticker, commission=0):
@@ -26,3 +29,36 @@ class Trader:
         price = self.stock_ticker.get_price()
         self.holdings -= amount
         self.cash += amount * price * (1 - self.commission)
+
+
+class MultiAssetTrader:
+    # vector version of Trader, one cash and holdings slot per ticker of a MultiStockTicker
+    def __init__(self, cash, stock_ticker, commission=0):
+        self.cash = np.full(len(stock_ticker.symbols), cash, dtype=np.float64)
+        self.holdings = np.zeros(len(stock_ticker.symbols)) # number of shares per ticker
+        self.stock_ticker = stock_ticker
+        self.commission = commission
+
+    def __str__(self):
+        return f"Cash: {self.cash.sum()}, Holdings: {dict(zip(self.stock_ticker.symbols, self.holdings))}"
+
+    def portfolio_value(self):
+        price = self.stock_ticker.get_price()
+        # tickers without a price yet (NaN) are never held
+        return self.cash + np.where(self.holdings == 0, 0, self.holdings * price)
+
+    def buy(self, amounts):
+        # amounts is a scalar or one cash amount per ticker, commission is a % of the amount
+        price = self.stock_ticker.get_price()
+        amounts = np.where(np.isnan(price), 0, np.broadcast_to(amounts, self.cash.shape))
+        amounts = np.where(self.cash < amounts * (1 + self.commission), self.cash / (1 + self.commission), amounts)
+        self.holdings = self.holdings + np.where(amounts > 0, amounts / price, 0)
+        self.cash = self.cash - amounts * (1 + self.commission)
+
+    def sell(self, amounts):
+        # amounts is a scalar or one number of shares per ticker
+        price = self.stock_ticker.get_price()
+        amounts = np.minimum(np.broadcast_to(amounts, self.holdings.shape), self.holdings)
+        amounts = np.where(np.isnan(price), 0, amounts)
+        self.holdings = self.holdings - amounts
+        self.cash = self.cash + amounts * np.nan_to_num(price) * (1 - self.commission)
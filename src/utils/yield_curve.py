@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+# months to maturity of every Treasury yield curve column
+MATURITY_TO_MONTHS = {
+    "3 Mo": 3,
+    "6 Mo": 6,
+    "1 Yr": 12,
+    "2 Yr": 24,
+    "3 Yr": 36,
+    "5 Yr": 60,
+    "7 Yr": 84,
+    "10 Yr": 120,
+    "20 Yr": 240,
+    "30 Yr": 360,
+}
+# proleptic Gregorian ordinal of 1970-01-01, pd.Timestamp("1970-01-01").toordinal()
+EPOCH_ORDINAL = 719163
+# average length of a month in days
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def to_ordinals(dates):
+    """
+    Proleptic Gregorian ordinals of an array of dates, like pd.Timestamp.toordinal
+    """
+    return np.asarray(dates).astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+
+def maturity_ordinals(dates, months):
+    """
+    Ordinals of every date plus every number of months, the day is clipped to the end of the month like pd.DateOffset.
+
+    returns
+    (dates, months) matrix of ordinals
+    """
+    days = np.asarray(dates).astype("datetime64[D]")
+    month_starts = days.astype("datetime64[M]")
+    day_of_month = days - month_starts.astype("datetime64[D]")
+
+    maturity_months = month_starts[:, None] + np.asarray(months)[None, :]
+    maturity_starts = maturity_months.astype("datetime64[D]")
+    month_lengths = (maturity_months + 1).astype("datetime64[D]") - maturity_starts
+    maturity_days = maturity_starts + np.minimum(day_of_month[:, None], month_lengths - 1)
+    return to_ordinals(maturity_days)
+
+
+def fill_tenors(yields, months):
+    """
+    Fills missing yields of a date by linear interpolation between its neighbouring tenors,
+    yields is a (dates, tenors) matrix. Missing shortest or longest tenors stay NaN.
+    """
+    df = pd.DataFrame(np.asarray(yields, dtype=np.float64), columns=np.asarray(months, dtype=np.float64))
+    return df.interpolate(method="index", axis=1, limit_area="inside").values
+
+
+def yield_surface(dates, yields, months, resolution=100, method="grid"):
+    """
+    Interpolates the yields on a resolution x resolution grid spanning the (date, maturity date) ordinals of the data.
+    yields is a (dates, tenors) matrix and months the months to maturity of its columns.
+
+    method
+    "grid": uses the regular (date, tenor) structure of the data. Missing tenors are filled per date
+    (see fill_tenors), then every grid point is read with RegularGridInterpolator at its date and
+    tenor (maturity date - date). The cost grows linearly with the number of dates.
+    "scattered": triangulates every (date, maturity date) point with griddata, slow for long histories.
+
+    returns
+    grid_x (date ordinals), grid_y (maturity date ordinals), grid_z (yields), NaN outside the data
+    """
+    # scipy.interpolate is slow to import, only load it when a surface is built
+    from scipy.interpolate import RegularGridInterpolator, griddata
+    date_ordinals = to_ordinals(dates)
+    maturity_dates = maturity_ordinals(dates, months)
+    grid_x, grid_y = np.mgrid[
+        date_ordinals.min():date_ordinals.max():resolution * 1j,
+        maturity_dates.min():maturity_dates.max():resolution * 1j
+    ]
+
+    if method == "grid":
+        interpolator = RegularGridInterpolator((date_ordinals, np.asarray(months, dtype=np.float64)), fill_tenors(yields, months),
+                                               bounds_error=False, fill_value=np.nan)
+        tenors = (grid_y - grid_x) / DAYS_PER_MONTH
+        grid_z = interpolator(np.stack([grid_x, tenors], axis=-1))
+    elif method == "scattered":
+        grid_z = griddata(
+            (np.repeat(date_ordinals, len(months)), maturity_dates.ravel()),
+            np.asarray(yields, dtype=np.float64).ravel(),
+            (grid_x, grid_y),
+            method="linear"
+        )
+    else:
+        raise ValueError(f"Unknown interpolation method {method}")
+    return grid_x, grid_y, grid_z
+
+
+def tenor_spreads(df):
+    """
+    Every pairwise spread between the tenors of a yield curve DataFrame (one column per tenor, shortest first).
+
+    returns
+    DataFrame with one "<long> - <short>" column per pair, on the index of df
+    """
+    short, long = np.triu_indices(df.shape[1], k=1)
+    values = df.values
+    columns = [f"{df.columns[j]} - {df.columns[i]}" for i, j in zip(short, long)]
+    return pd.DataFrame(values[:, long] - values[:, short], index=df.index, columns=columns)
+
+
+def inversion_episodes(spread, min_length=1):
+    """
+    Runs of consecutive dates with a negative spread, NaN spreads end a run.
+    min_length drops runs shorter than this number of dates.
+
+    returns
+    DataFrame of start, end (first and last inverted date), length (number of dates) and
+    duration (calendar days from start to end) per episode
+    """
+    inverted = np.concatenate([[False], np.asarray(spread < 0), [False]])
+    changes = np.flatnonzero(inverted[1:] != inverted[:-1])
+    starts, ends = changes[::2], changes[1::2] - 1
+    lengths = ends - starts + 1
+    keep = lengths >= min_length
+    dates = spread.index
+    return pd.DataFrame({
+        "start": dates[starts[keep]],
+        "end": dates[ends[keep]],
+        "length": lengths[keep],
+        "duration": (dates[ends[keep]] - dates[starts[keep]]).days,
+    })
+
+
+# Nelson-Siegel-Svensson curve, tenors and decay parameters (lambdas) in years.
+# lambda1 fits the short end and lambda2 the long end, they are kept in separate ranges.
+# Near the common bound the loadings are still nearly collinear, large betas of opposite signs then cancel out
+# and fit as well as sensible ones: a ridge pulls the betas towards the curve's own level (beta0, the longest
+# yield), slope (beta1, shortest - longest) and no curvature (beta2 = beta3 = 0).
+NSS_COLUMNS = ["beta0", "beta1", "beta2", "beta3", "lambda1", "lambda2", "rmse"]
+LAMBDA1_BOUNDS = (0.05, 5)
+LAMBDA2_BOUNDS = (5, 30)
+NSS_RIDGE = 1e-4
+# lambda pairs profiled for every date, its fit starts from the best one
+LAMBDA_GRID = np.array([(lambda1, lambda2)
+                        for lambda1 in np.geomspace(*LAMBDA1_BOUNDS, 20)
+                        for lambda2 in np.geomspace(*LAMBDA2_BOUNDS, 10)])
+
+
+def nss_loadings(tenors, lambda1, lambda2):
+    """
+    Loadings of beta0..beta3 of the Nelson-Siegel-Svensson curve.
+    lambda1 and lambda2 are scalars, giving a (tenors, 4) matrix, or arrays of one pair per date,
+    giving a (dates, tenors, 4) array.
+    """
+    tenors = np.asarray(tenors, dtype=np.float64)
+    x1, x2 = tenors / np.expand_dims(lambda1, -1), tenors / np.expand_dims(lambda2, -1)
+    decay1, decay2 = np.exp(-x1), np.exp(-x2)
+    slope1, slope2 = (1 - decay1) / x1, (1 - decay2) / x2
+    return np.stack([np.ones_like(x1), slope1, slope1 - decay1, slope2 - decay2], axis=-1)
+
+
+def nss_yields(params, tenors):
+    """
+    Yields of the Nelson-Siegel-Svensson curve with params (beta0, beta1, beta2, beta3, lambda1, lambda2)
+    """
+    return nss_loadings(tenors, params[4], params[5]) @ np.asarray(params[:4])
+
+
+def _nss_prior(yields, weights):
+    # level and slope of every curve from its longest and shortest observed yields
+    columns = np.arange(yields.shape[1])
+    longest = np.take_along_axis(yields, np.argmax(np.where(weights > 0, columns, -1), axis=1)[:, None], axis=1)[:, 0]
+    shortest = np.take_along_axis(yields, np.argmin(np.where(weights > 0, columns, len(columns)), axis=1)[:, None], axis=1)[:, 0]
+    return np.column_stack([longest, shortest - longest, np.zeros((len(yields), 2))])
+
+
+def _nss_residuals(tenors, yields, weights, log_lambdas, prior, ridge=NSS_RIDGE):
+    # betas are linear given the lambdas, solved for every date by ridge-penalized weighted least squares
+    # (variable projection), missing yields have a weight of 0. The residuals end with the penalty terms
+    # sqrt(ridge) * (betas - prior), so the lambdas are fitted on the same penalized cost.
+    loadings = nss_loadings(tenors, *np.exp(log_lambdas).T)
+    weighted = loadings * weights[:, :, None]
+    normal = np.swapaxes(weighted, 1, 2) @ loadings + ridge * np.eye(4)
+    rhs = np.einsum("nki,nk->ni", weighted, yields) + ridge * prior
+    betas = np.linalg.solve(normal, rhs[:, :, None])[:, :, 0]
+    residuals = (yields - np.einsum("nki,ni->nk", loadings, betas)) * weights
+    return betas, np.concatenate([residuals, np.sqrt(ridge) * (betas - prior)], axis=1)
+
+
+def _nss_grid_search(tenors, values, observed):
+    # best LAMBDA_GRID pair of every date, the dates sharing the same missing tenors are profiled at once
+    # by projecting their yields on the residual space of every pair
+    best = np.zeros(len(values), dtype=np.int64)
+    patterns, pattern_rows = np.unique(observed, axis=0, return_inverse=True)
+    for p, pattern in enumerate(patterns):
+        rows = np.flatnonzero(pattern_rows.ravel() == p)
+        loadings = nss_loadings(tenors[pattern], *LAMBDA_GRID.T)
+        projections = np.eye(pattern.sum()) - loadings @ np.linalg.pinv(loadings)
+        residuals = np.einsum("gij,nj->gni", projections, values[rows][:, pattern])
+        best[rows] = np.argmin(np.sum(residuals ** 2, axis=2), axis=0)
+    return np.log(LAMBDA_GRID[best])
+
+
+def _fit_nss_curves(tenors, yields, weights, prior, log_lambdas, max_iter=50, tol=1e-10, step=1e-6):
+    # Levenberg-Marquardt on the log lambdas of every date at once, the Jacobian by forward differences.
+    # Every date keeps its own damping and stops when its cost no longer improves.
+    lower, upper = np.log([LAMBDA1_BOUNDS[0], LAMBDA2_BOUNDS[0]]), np.log([LAMBDA1_BOUNDS[1], LAMBDA2_BOUNDS[1]])
+    log_lambdas = log_lambdas.copy()
+    betas, residuals = _nss_residuals(tenors, yields, weights, log_lambdas, prior)
+    cost = np.sum(residuals ** 2, axis=1)
+    damping = np.full(len(yields), 1e-3)
+    active = np.arange(len(yields))
+    for _ in range(max_iter):
+        y, w, b, x, r = yields[active], weights[active], prior[active], log_lambdas[active], residuals[active]
+        jacobian = np.stack([
+            (_nss_residuals(tenors, y, w, x + step * unit, b)[1] - r) / step for unit in np.eye(2)
+        ], axis=-1)
+        hessian = np.swapaxes(jacobian, 1, 2) @ jacobian + damping[active, None, None] * np.eye(2)
+        gradient = np.einsum("nki,nk->ni", jacobian, r)
+        new_x = np.clip(x - np.linalg.solve(hessian, gradient[:, :, None])[:, :, 0], lower, upper)
+        new_betas, new_r = _nss_residuals(tenors, y, w, new_x, b)
+        new_cost = np.sum(new_r ** 2, axis=1)
+
+        better = new_cost < cost[active]
+        converged = better & (cost[active] - new_cost <= tol * cost[active])
+        accepted = active[better]
+        log_lambdas[accepted], betas[accepted], residuals[accepted], cost[accepted] = \
+            new_x[better], new_betas[better], new_r[better], new_cost[better]
+        damping[active] = np.where(better, damping[active] / 10, damping[active] * 10)
+        active = active[~converged & (damping[active] < 1e6)]
+        if len(active) == 0:
+            break
+    return betas, log_lambdas, cost
+
+
+def fit_nss(df, tenors=None):
+    """
+    Fits a Nelson-Siegel-Svensson curve to every date of a yield curve DataFrame (one column per tenor),
+    all dates are solved together with array operations.
+    tenors are the tenors of the columns in years, by default taken from MATURITY_TO_MONTHS.
+    Every date is fitted from its best LAMBDA_GRID pair and again warm-started from the fit of the
+    previous date, the better of both fits is kept. The betas are ridge-penalized by NSS_RIDGE towards the
+    level and slope of the curve, see _nss_prior.
+    Missing yields are left out, dates with fewer than 6 yields get NaN.
+
+    returns
+    DataFrame of NSS_COLUMNS on the index of df, rmse is the root mean squared error of the fit
+    """
+    tenors = np.array([MATURITY_TO_MONTHS[column] / 12 for column in df.columns] if tenors is None else tenors, dtype=np.float64)
+    values = df.values.astype(np.float64)
+    observed = ~np.isnan(values)
+    valid = observed.sum(axis=1) >= 6
+    yields, weights = np.where(observed, values, 0)[valid], observed[valid].astype(np.float64)
+
+    prior = _nss_prior(yields, weights)
+    betas, log_lambdas, cost = _fit_nss_curves(tenors, yields, weights, prior, _nss_grid_search(tenors, yields, observed[valid]))
+    # warm start from the previous date, keeps the fits on the same basin from day to day
+    warm = _fit_nss_curves(tenors, yields, weights, prior, np.concatenate([log_lambdas[:1], log_lambdas[:-1]]))
+    use_warm = warm[2] <= cost
+    betas[use_warm], log_lambdas[use_warm], cost[use_warm] = warm[0][use_warm], warm[1][use_warm], warm[2][use_warm]
+
+    results = np.full((len(values), len(NSS_COLUMNS)), np.nan)
+    # rmse of the fitted yields only, without the penalty terms
+    residuals = _nss_residuals(tenors, yields, weights, log_lambdas, prior)[1][:, :len(tenors)]
+    rmse = np.sqrt(np.sum(residuals ** 2, axis=1) / weights.sum(axis=1))
+    results[valid] = np.column_stack([betas, np.exp(log_lambdas), rmse])
+    return pd.DataFrame(results, index=df.index, columns=NSS_COLUMNS)
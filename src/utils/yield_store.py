@@ -0,0 +1,92 @@
+from functools import lru_cache
+import os
+import numpy as np
+import pandas as pd
+
+from utils.factor_store import date_to_int
+from utils.stores import is_fresh, read_meta, write_meta
+
+YIELD_CURVE_PATH = "data/treasury_yield_curve.csv"
+YIELD_STORE_PATH = "data/cache/treasury_yield_curve/"
+
+
+class YieldStore:
+    # Treasury yield curve converted once from the CSV into one partition per year:
+    # <year>.dates.npy with sorted yyyymmdd integers and <year>.yields.npy with a float32 (dates, maturities) matrix.
+    # Partitions are memory-mapped when first queried, so a query only touches the years it covers.
+    def __init__(self, csv_path=YIELD_CURVE_PATH, path=YIELD_STORE_PATH):
+        self.csv_path = csv_path
+        self.path = path
+        if not is_fresh(path, csv_path):
+            self._build()
+
+        meta = read_meta(path)
+        self.maturities = meta["maturities"]
+        self.years = meta["years"]
+        self.partitions = {}
+
+    def _build(self):
+        df = pd.read_csv(self.csv_path, parse_dates=["Date"]).sort_values("Date")
+        os.makedirs(self.path, exist_ok=True)
+        dates = (df["Date"].dt.year * 10000 + df["Date"].dt.month * 100 + df["Date"].dt.day).values.astype(np.int64)
+        yields = df.drop(columns="Date").values.astype(np.float32)
+        years = dates // 10000
+        for year in np.unique(years):
+            rows = years == year
+            np.save(os.path.join(self.path, f"{year}.dates.npy"), dates[rows])
+            np.save(os.path.join(self.path, f"{year}.yields.npy"), yields[rows])
+        # meta.json is written last, it marks the store as complete
+        write_meta(self.path, self.csv_path, maturities=list(df.columns[1:]),
+                   years=[int(year) for year in np.unique(years)])
+
+    def _partition(self, year):
+        if year not in self.partitions:
+            self.partitions[year] = (
+                np.load(os.path.join(self.path, f"{year}.dates.npy"), mmap_mode="r"),
+                np.load(os.path.join(self.path, f"{year}.yields.npy"), mmap_mode="r"),
+            )
+        return self.partitions[year]
+
+    def query(self, start_date=None, end_date=None, every=1):
+        """
+        Returns the dates between start_date and end_date (both included, None for no bound)
+        and the float32 (dates, maturities) yield matrix, keeping every `every`-th date.
+        Only the selected rows are copied out of the partitions.
+        """
+        start = date_to_int(start_date) if start_date is not None else 0
+        end = date_to_int(end_date) if end_date is not None else 99999999
+        dates, yields = [], []
+        # rows already taken from previous partitions, keeps the decimation steady across years
+        n_rows = 0
+        for year in self.years:
+            if year < start // 10000 or year > end // 10000:
+                continue
+            year_dates, year_yields = self._partition(year)
+            i = np.searchsorted(year_dates, start, side="left")
+            j = np.searchsorted(year_dates, end, side="right")
+            offset = -n_rows % every
+            dates.append(year_dates[i + offset:j:every])
+            yields.append(year_yields[i + offset:j:every])
+            n_rows += max(j - i, 0)
+
+        if not dates:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.maturities)), dtype=np.float32)
+        return np.concatenate(dates), np.concatenate(yields)
+
+    def to_frame(self, start_date=None, end_date=None, every=1):
+        """
+        Returns the yields between start_date and end_date as a DataFrame indexed by Date, one column per maturity
+        """
+        dates, yields = self.query(start_date, end_date, every)
+        # the Treasury publishes 2 decimals, rounding removes the float32 representation error
+        yields = np.round(yields.astype(np.float64), 2)
+        index = pd.to_datetime(dates.astype(str), format="%Y%m%d").rename("Date")
+        return pd.DataFrame(yields, index=index, columns=self.maturities)
+
+
+@lru_cache
+def get_yield_store(csv_path=YIELD_CURVE_PATH, path=YIELD_STORE_PATH):
+    """
+    Returns the YieldStore of the process, opened once
+    """
+    return YieldStore(csv_path, path)